@@ -0,0 +1,7 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def eager_tasks(settings):
+    """Задачи очереди выполняются сразу: тестам не нужен run_workers."""
+    settings.TASKS_EAGER = True
@@ -0,0 +1,81 @@
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.management.pools import pool_map, worker_pool
+from core.tasks import DONE, FAILED, RETRY, claim, run_task
+
+
+def _work(task_id):
+    try:
+        return run_task(task_id)
+    finally:
+        # У каждого потока и процесса пула своё соединение с БД.
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет задачи фоновой очереди в пуле потоков или процессов. '
+        'С --once выходит, когда готовых задач не осталось.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.TASKS_WORKERS,
+            help='Размер пула; 1 - без пула, в основном потоке.',
+        )
+        parser.add_argument(
+            '--processes', action='store_true',
+            help='Пул процессов вместо пула потоков.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help='Сколько задач забирать за раз; по умолчанию 4 на worker.',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float,
+            default=settings.TASKS_POLL_INTERVAL,
+            help='Пауза в секундах, когда очередь пуста.',
+        )
+        parser.add_argument('--once', action='store_true')
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        workers = max(1, options['workers'])
+        batch_size = options['batch_size'] or workers * 4
+        counts = Counter()
+        started = time.monotonic()
+        with worker_pool(
+            workers, options['processes'], thread_name_prefix='tasks'
+        ) as pool:
+            try:
+                while True:
+                    task_ids = claim(batch_size)
+                    if not task_ids:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll_interval'])
+                        continue
+                    counts.update(pool_map(
+                        pool, run_task if pool is None else _work, task_ids
+                    ))
+                    self._report(counts, started)
+            except KeyboardInterrupt:
+                # Взятые, но не выполненные задачи вернутся в очередь
+                # через TASKS_LOCK_TIMEOUT.
+                pass
+        self.stdout.write(self.style.SUCCESS(
+            f'Задач: {sum(counts.values())}; выполнено: {counts[DONE]}, '
+            f'на повтор: {counts[RETRY]}, с ошибкой: {counts[FAILED]}'
+        ))
+
+    def _report(self, counts, started):
+        if self.verbosity < 2:
+            return
+        elapsed = time.monotonic() - started
+        total = sum(counts.values())
+        self.stdout.write(f'{total} задач за {elapsed:.1f} с')
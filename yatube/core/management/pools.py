@@ -0,0 +1,38 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.db import connections
+
+
+@contextmanager
+def worker_pool(workers, processes=True, thread_name_prefix=''):
+    """Пул потоков или процессов для команды; None, если workers <= 1.
+
+    На выходе пул дожидается отправленной работы и закрывается.
+    """
+    pool = None
+    if workers > 1 and processes:
+        # Дочерние процессы наследуют настроенный Django через fork.
+        pool = ProcessPoolExecutor(
+            workers, mp_context=multiprocessing.get_context('fork')
+        )
+    elif workers > 1:
+        pool = ThreadPoolExecutor(
+            workers, thread_name_prefix=thread_name_prefix
+        )
+    try:
+        yield pool
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+def pool_map(pool, func, items, chunksize=1):
+    """map через пул, а без пула - в текущем потоке."""
+    if pool is None:
+        return map(func, items)
+    if isinstance(pool, ProcessPoolExecutor):
+        # Соединения с БД нельзя делить между процессами.
+        connections.close_all()
+    return pool.map(func, items, chunksize=chunksize)
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 
 class CreatedModel(models.Model):
@@ -10,3 +11,60 @@ class CreatedModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class Task(CreatedModel):
+    """Задача фоновой очереди, которую выполняет run_workers."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'Ждёт'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField('Задача', max_length=200)
+    payload = models.TextField('Аргументы', default='{}')
+    dedupe_key = models.CharField(
+        'Ключ дедупликации',
+        max_length=200,
+        null=True,
+        blank=True,
+    )
+    status = models.CharField(
+        'Статус',
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING,
+    )
+    attempts = models.PositiveIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveIntegerField('Максимум попыток', default=3)
+    run_at = models.DateTimeField('Выполнить не раньше', default=timezone.now)
+    locked_by = models.CharField('Взята обработчиком', max_length=32,
+                                 blank=True)
+    locked_at = models.DateTimeField('Взята', null=True, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+
+    class Meta:
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+        constraints = [
+            # Одна ожидающая задача на ключ; взятая в работу не мешает
+            # поставить новую.
+            models.UniqueConstraint(
+                fields=('dedupe_key',),
+                condition=models.Q(status='pending'),
+                name='unique_pending_task',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=('status', 'run_at'),
+                name='task_status_run_at_idx',
+            ),
+            models.Index(fields=('locked_by',), name='task_locked_by_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.name} ({self.get_status_display()})'
@@ -0,0 +1,80 @@
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import render
+
+START_KEY = 'ratelimit:{}:{}:start'
+USED_KEY = 'ratelimit:{}:{}:used'
+
+
+def take_token(name, ident, now=None):
+    """Берёт токен из ведра name для ident (пользователя или адреса).
+
+    Ведро вмещает burst токенов и наполняется целиком за period секунд
+    (RATELIMITS[name] = (burst, period)). В кэше лежат время создания
+    ведра и счётчик взятых токенов; токены добавляются и возвращаются
+    через incr/decr. В memcached и Redis они атомарны, и одновременные
+    запросы не могут взять больше, чем есть; у DatabaseCache это
+    чтение и запись, и в гонке ведро может отдать лишний токен.
+    Возвращает 0, если токен взят, иначе через сколько секунд
+    появится следующий.
+    """
+    burst, period = settings.RATELIMITS[name]
+    rate = burst / period
+    now = time.time() if now is None else now
+    start_key = START_KEY.format(name, ident)
+    used_key = USED_KEY.format(name, ident)
+    found = cache.get_many([start_key, used_key])
+    if len(found) < 2:
+        # Новое, истёкшее или вытесненное ведро - полное.
+        found = {start_key: now, used_key: 0}
+        cache.set_many(found, period * settings.RATELIMIT_KEY_PERIODS)
+    refilled = (now - found[start_key]) * rate
+    try:
+        if refilled - found[used_key] >= 1:
+            # Ведро не наполняется сверх burst: лишние токены списываются.
+            # При гонке их спишут дважды, и ведро окажется лишь строже.
+            cache.incr(used_key, int(refilled - found[used_key]))
+        used = cache.incr(used_key)
+    except ValueError:
+        # Ключ истёк между чтением и incr.
+        return 0
+    deficit = used - burst - refilled
+    if deficit <= 0:
+        return 0
+    cache.decr(used_key)
+    return max(1, math.ceil(deficit / rate))
+
+
+def _ident(request):
+    if request.user.is_authenticated:
+        return f'user{request.user.pk}'
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def ratelimit(name):
+    """Ограничивает POST-запросы к view ведром токенов RATELIMITS[name].
+
+    Проверка идёт до формы и записи в БД: лишний запрос сразу
+    получает 429 с заголовком Retry-After.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method == 'POST' and name in settings.RATELIMITS:
+                retry_after = take_token(name, _ident(request))
+                if retry_after:
+                    response = render(
+                        request,
+                        'includes/core/429.html',
+                        {'retry_after': retry_after},
+                        status=429,
+                    )
+                    response['Retry-After'] = retry_after
+                    return response
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,44 @@
+import hashlib
+import os
+import posixpath
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранит загрузки под sha256 их содержимого.
+
+    Файл из каталога upload_to кладётся в <каталог>/ab/cd/<хеш>.<ext>.
+    Если такой файл уже есть, он используется повторно вместе со всеми
+    миниатюрами: их ключи зависят только от имени исходника.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            return name
+        # Одновременная загрузка одинаковых файлов в худшем случае
+        # даст копию с суффиксом, как у обычного FileSystemStorage.
+        return super().save(name, content, max_length)
+
+    @staticmethod
+    def hashed_name(name, content):
+        """Имя файла по хешу содержимого, которое читается порциями."""
+        digest = hashlib.sha256()
+        if content.seekable():
+            content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        if content.seekable():
+            content.seek(0)
+        digest = digest.hexdigest()
+        dirname, basename = posixpath.split(name.replace('\\', '/'))
+        ext = os.path.splitext(basename)[1].lower()
+        return posixpath.join(dirname, digest[:2], digest[2:4], digest + ext)
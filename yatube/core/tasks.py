@@ -0,0 +1,165 @@
+import datetime
+import json
+import logging
+import traceback
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+# Итоги выполнения одной задачи.
+DONE = 'done'
+RETRY = 'retry'
+FAILED = 'failed'
+
+# Имя задачи -> функция. Задачи регистрируются при импорте модулей,
+# где объявлены, поэтому объявлять их нужно в модулях, которые
+# загружаются при старте Django (например, через signals приложения).
+_registry = {}
+
+
+def task(name=None, max_attempts=None):
+    """Регистрирует функцию как задачу очереди.
+
+    У функции появляется delay(*args, dedupe_key=None, **kwargs), который
+    ставит вызов в очередь. Аргументы должны сериализоваться в JSON.
+    """
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__name__}'
+        _registry[task_name] = func
+
+        def delay(*args, dedupe_key=None, **kwargs):
+            enqueue(
+                task_name,
+                args,
+                kwargs,
+                dedupe_key=dedupe_key,
+                max_attempts=max_attempts,
+            )
+
+        func.task_name = task_name
+        func.delay = delay
+        return func
+    return decorator
+
+
+def enqueue(name, args=(), kwargs=None, dedupe_key=None, max_attempts=None):
+    """Ставит задачу в очередь в текущей транзакции.
+
+    Обработчики увидят задачу только после коммита, вместе с данными,
+    ради которых она поставлена. Если с тем же dedupe_key уже ждёт
+    другая задача, новая отбрасывается. При TASKS_EAGER задача
+    выполняется сразу, и её исключения не перехватываются.
+    """
+    kwargs = kwargs or {}
+    if settings.TASKS_EAGER:
+        _registry[name](*args, **kwargs)
+        return
+    Task.objects.bulk_create(
+        [
+            Task(
+                name=name,
+                payload=json.dumps({'args': list(args), 'kwargs': kwargs}),
+                dedupe_key=dedupe_key,
+                max_attempts=max_attempts or settings.TASKS_MAX_ATTEMPTS,
+            ),
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def _requeue(task):
+    """Возвращает задачу в ожидание; если такая уже ждёт - удаляет."""
+    task.status = Task.PENDING
+    task.locked_by = ''
+    task.locked_at = None
+    try:
+        with transaction.atomic():
+            task.save(update_fields=[
+                'status', 'locked_by', 'locked_at', 'attempts', 'run_at',
+                'last_error',
+            ])
+    except IntegrityError:
+        Task.objects.filter(pk=task.pk).delete()
+
+
+def _requeue_stale(now):
+    """Задачи упавших обработчиков снова ждут через TASKS_LOCK_TIMEOUT."""
+    stale = Task.objects.filter(
+        status=Task.RUNNING,
+        locked_at__lt=now - datetime.timedelta(
+            seconds=settings.TASKS_LOCK_TIMEOUT
+        ),
+    )
+    for task in stale:
+        _requeue(task)
+
+
+def claim(limit):
+    """Забирает до limit готовых задач одним UPDATE; возвращает их id.
+
+    Условие status = pending проверяется в самом UPDATE, так что
+    одну задачу не заберут два обработчика.
+    """
+    now = timezone.now()
+    _requeue_stale(now)
+    token = uuid.uuid4().hex
+    ready = Task.objects.filter(
+        status=Task.PENDING, run_at__lte=now
+    ).order_by('run_at', 'id').values('id')[:limit]
+    Task.objects.filter(pk__in=ready, status=Task.PENDING).update(
+        status=Task.RUNNING, locked_by=token, locked_at=now
+    )
+    return list(
+        Task.objects.filter(locked_by=token).order_by('run_at', 'id')
+        .values_list('id', flat=True)
+    )
+
+
+def run_task(task_id):
+    """Выполняет взятую задачу.
+
+    Успешная задача удаляется. После ошибки задача ждёт повтора
+    с удвоением паузы от TASKS_RETRY_DELAY, а после max_attempts
+    попыток остаётся в статусе failed с текстом ошибки.
+    """
+    task = Task.objects.filter(pk=task_id, status=Task.RUNNING).first()
+    if task is None:
+        return None
+    try:
+        payload = json.loads(task.payload)
+        _registry[task.name](*payload['args'], **payload['kwargs'])
+    except Exception:
+        logger.exception('Задача %s #%s упала', task.name, task.pk)
+        task.attempts += 1
+        task.last_error = traceback.format_exc()
+        if task.attempts >= task.max_attempts:
+            Task.objects.filter(pk=task.pk).update(
+                status=Task.FAILED,
+                attempts=task.attempts,
+                last_error=task.last_error,
+            )
+            return FAILED
+        task.run_at = timezone.now() + datetime.timedelta(
+            seconds=settings.TASKS_RETRY_DELAY * 2 ** (task.attempts - 1)
+        )
+        _requeue(task)
+        return RETRY
+    Task.objects.filter(pk=task.pk).delete()
+    return DONE
+
+
+def run_pending(batch_size=100):
+    """Выполняет готовые задачи в текущем потоке, пока они есть."""
+    results = Counter()
+    while True:
+        task_ids = claim(batch_size)
+        if not task_ids:
+            return results
+        results.update(map(run_task, task_ids))
@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import Client, TestCase, override_settings
+from django.utils.http import http_date
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+CONTENT = bytes(range(100))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, MEDIA_SERVE_MODE='python')
+class ServeMediaTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(TEMP_MEDIA_ROOT, 'posts'))
+        cls.path = os.path.join(TEMP_MEDIA_ROOT, 'posts', 'file.jpg')
+        with open(cls.path, 'wb') as file:
+            file.write(CONTENT)
+        cls.url = '/media/posts/file.jpg'
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_full_file(self):
+        '''Файл отдаётся целиком с заголовками кэширования'''
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('public', response['Cache-Control'])
+        self.assertTrue(response['ETag'])
+
+    def test_not_modified(self):
+        '''If-None-Match и If-Modified-Since дают 304'''
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        mtime = os.stat(self.path).st_mtime
+        response = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=http_date(mtime + 1)
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_byte_ranges(self):
+        '''Range отдаёт 206 с нужными байтами'''
+        cases = {
+            'bytes=10-19': (10, 19),
+            'bytes=90-': (90, 99),
+            'bytes=-5': (95, 99),
+            'bytes=95-500': (95, 99),
+        }
+        for header, (start, end) in cases.items():
+            with self.subTest(header=header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(
+                    b''.join(response.streaming_content),
+                    CONTENT[start:end + 1],
+                )
+                self.assertEqual(
+                    response['Content-Range'], f'bytes {start}-{end}/100'
+                )
+                self.assertEqual(
+                    response['Content-Length'], str(end - start + 1)
+                )
+
+    def test_unsatisfiable_and_stale_ranges(self):
+        '''Диапазон за концом файла - 416, устаревший If-Range - 200'''
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */100')
+        response = self.client.get(
+            self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"old"'
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-1,5-6')
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_and_outside_files(self):
+        '''Нет файла или путь вне MEDIA_ROOT - 404, POST - 405'''
+        for url in ('/media/posts/none.jpg', '/media/../manage.py',
+                    '/media/posts/'):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.post(self.url).status_code, 405)
+
+    def test_accelerated_modes(self):
+        '''В режимах x-accel и x-sendfile тело отдаёт веб-сервер'''
+        with self.settings(MEDIA_SERVE_MODE='x-accel'):
+            response = self.client.get(self.url)
+        self.assertEqual(
+            response['X-Accel-Redirect'], '/protected-media/posts/file.jpg'
+        )
+        self.assertEqual(response.content, b'')
+        with self.settings(MEDIA_SERVE_MODE='x-sendfile'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Sendfile'], self.path)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
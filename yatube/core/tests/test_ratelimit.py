@@ -0,0 +1,56 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.ratelimit import take_token
+from posts.models import Post
+
+User = get_user_model()
+# Ведро в памяти: запросы к таблице кэша не мешают считать запросы view.
+LOCMEM_CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+}}
+
+
+@override_settings(RATELIMITS={'test': (2, 60), 'post_create': (2, 60)})
+class RateLimitTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='writer')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_bucket_refills_over_time(self):
+        '''Ведро отдаёт burst токенов и пополняется со временем'''
+        self.assertEqual(take_token('test', 'a', now=0), 0)
+        self.assertEqual(take_token('test', 'a', now=0), 0)
+        self.assertEqual(take_token('test', 'a', now=1), 29)
+        self.assertEqual(take_token('test', 'b', now=1), 0)
+        self.assertEqual(take_token('test', 'a', now=30), 0)
+        self.assertEqual(take_token('test', 'a', now=30), 30)
+
+    def test_idle_bucket_holds_only_burst(self):
+        '''После простоя накапливается не больше burst токенов'''
+        take_token('test', 'a', now=0)
+        results = [take_token('test', 'a', now=6000) for _ in range(3)]
+        self.assertEqual(results, [0, 0, 30])
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_post_create_rejected_before_form(self):
+        '''Лишний пост получает 429 до проверки формы и записи в БД'''
+        url = reverse('posts:post_create')
+        for _ in range(2):
+            self.client.post(url, {'text': 'Пост'})
+        with mock.patch('posts.views.PostForm') as form, \
+                self.assertNumQueries(2):
+            response = self.client.post(url, {'text': 'Ещё пост'})
+        form.assert_not_called()
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(int(response['Retry-After']) > 0)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(self.client.get(url).status_code, 200)
@@ -0,0 +1,98 @@
+import datetime
+import io
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.models import Task
+from core.tasks import DONE, FAILED, RETRY, claim, run_pending, run_task, task
+
+CALLS = []
+
+
+@task(name='tests.record')
+def record(value, suffix=''):
+    CALLS.append(f'{value}{suffix}')
+
+
+@task(name='tests.broken', max_attempts=2)
+def broken():
+    raise RuntimeError('сломалось')
+
+
+@override_settings(TASKS_EAGER=False, TASKS_RETRY_DELAY=10)
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_delay_enqueues_and_worker_runs(self):
+        '''delay ставит задачу, обработчик выполняет и удаляет её'''
+        record.delay('пост', suffix='!')
+        self.assertEqual(CALLS, [])
+        self.assertEqual(run_pending(), {DONE: 1})
+        self.assertEqual(CALLS, ['пост!'])
+        self.assertFalse(Task.objects.exists())
+
+    def test_pending_tasks_are_deduplicated(self):
+        '''Пока задача ждёт, задача с тем же ключом не ставится'''
+        record.delay(1, dedupe_key='key')
+        record.delay(2, dedupe_key='key')
+        record.delay(3)
+        self.assertEqual(Task.objects.count(), 2)
+        claim(10)
+        record.delay(4, dedupe_key='key')
+        self.assertEqual(Task.objects.count(), 3)
+
+    def test_claimed_task_is_not_claimed_again(self):
+        '''Взятую задачу не заберёт второй обработчик'''
+        record.delay(1)
+        first = claim(10)
+        self.assertEqual(len(first), 1)
+        self.assertEqual(claim(10), [])
+        self.assertEqual(run_task(first[0]), DONE)
+        self.assertIsNone(run_task(first[0]))
+
+    def test_failed_task_retries_with_backoff(self):
+        '''Упавшая задача повторяется позже, затем остаётся failed'''
+        broken.delay()
+        self.assertEqual(run_pending(), {RETRY: 1})
+        task = Task.objects.get()
+        self.assertEqual(task.status, Task.PENDING)
+        self.assertEqual(task.attempts, 1)
+        self.assertIn('сломалось', task.last_error)
+        self.assertGreater(
+            task.run_at, timezone.now() + datetime.timedelta(seconds=5)
+        )
+        self.assertEqual(run_pending(), {})
+        Task.objects.update(run_at=timezone.now())
+        self.assertEqual(run_pending(), {FAILED: 1})
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.FAILED, 2))
+
+    def test_stale_task_is_requeued(self):
+        '''Задача пропавшего обработчика снова попадает в очередь'''
+        record.delay(1)
+        task_id, = claim(10)
+        Task.objects.update(
+            locked_at=timezone.now() - datetime.timedelta(hours=1)
+        )
+        self.assertEqual(claim(10), [task_id])
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager_mode_runs_immediately(self):
+        '''С TASKS_EAGER задача выполняется сразу, без записи в таблицу'''
+        record.delay('сразу')
+        self.assertEqual(CALLS, ['сразу'])
+        self.assertFalse(Task.objects.exists())
+
+    def test_run_workers_once(self):
+        '''run_workers --once выполняет очередь и выходит'''
+        for value in range(5):
+            record.delay(value)
+        broken.delay()
+        out = io.StringIO()
+        call_command('run_workers', once=True, workers=1, stdout=out)
+        self.assertEqual(sorted(CALLS), ['0', '1', '2', '3', '4'])
+        self.assertIn('выполнено: 5, на повтор: 1, с ошибкой: 0',
+                      out.getvalue())
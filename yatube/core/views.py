@@ -1,4 +1,24 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import render
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.views.decorators.http import require_safe
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
 
 
 def page_not_found(request, exception):
@@ -20,3 +40,115 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'includes/core/403csrf.html')
+
+
+def _media_path(path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+    return full_path
+
+
+def _byte_range(request, size, etag, last_modified):
+    """Диапазон (start, end) из заголовка Range.
+
+    None - отдать весь файл: заголовка нет, диапазонов несколько или
+    If-Range не совпал с текущей версией. False - диапазон вне файла.
+    """
+    match = RANGE_RE.match(request.META.get('HTTP_RANGE', '').strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range != etag and (
+        parse_http_date_safe(if_range) != last_modified
+    ):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start > end:
+        return False
+    return start, end
+
+
+def _read_range(full_path, start, length):
+    with open(full_path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _media_response(request, path, full_path, size, etag, last_modified):
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+    mode = settings.MEDIA_SERVE_MODE
+    if mode == 'x-accel':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = quote(
+            settings.MEDIA_ACCEL_REDIRECT_PREFIX + path
+        )
+        return response
+    if mode == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = full_path
+        return response
+    byte_range = _byte_range(request, size, etag, last_modified)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    if byte_range is None:
+        response = FileResponse(
+            open(full_path, 'rb'), content_type=content_type
+        )
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _read_range(full_path, start, end - start + 1),
+            status=206,
+            content_type=content_type,
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+    response['Accept-Ranges'] = 'bytes'
+    if encoding:
+        response['Content-Encoding'] = encoding
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """Отдаёт файл из MEDIA_ROOT, когда DEBUG выключен.
+
+    Поддерживает Range, If-None-Match и If-Modified-Since. В режимах
+    MEDIA_SERVE_MODE 'x-accel' и 'x-sendfile' view только проверяет
+    путь и кэш-заголовки, а сам файл отдаёт веб-сервер перед Django.
+    """
+    full_path = _media_path(path)
+    stat = os.stat(full_path)
+    last_modified = int(stat.st_mtime)
+    etag = quote_etag(f'{last_modified:x}-{stat.st_size:x}')
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        response = _media_response(
+            request, path, full_path, stat.st_size, etag, last_modified
+        )
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(
+        response, public=True, max_age=settings.MEDIA_CACHE_MAX_AGE
+    )
+    return response
@@ -1,6 +1,130 @@
+import datetime
+import hashlib
+
+from django import forms
+from django.conf import settings
 from django.contrib import admin
+from django.core.exceptions import EmptyResultSet
+from django.db.models import DateTimeField, Max, Min, QuerySet
+from django.forms.utils import flatatt
+from django.utils import timezone
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
 
 from .models import Post, Group
+from .search import SearchResults, search_available
+from .utils import CachedCountPaginator, count_scope
+
+
+def _period(day, kind):
+    """Начало периода kind, в который попадает day, и начало следующего."""
+    if kind == 'year':
+        return day.replace(month=1, day=1), datetime.date(day.year + 1, 1, 1)
+    if kind == 'month':
+        start = day.replace(day=1)
+        return start, (start + datetime.timedelta(days=31)).replace(day=1)
+    return day, day + datetime.timedelta(days=1)
+
+
+class PostAdminQuerySet(QuerySet):
+    """QuerySet списка постов в админке.
+
+    dates() для date_hierarchy ищет годы, месяцы и дни не через
+    SELECT DISTINCT по всей таблице, а прыжками по индексу pub_date:
+    MIN(pub_date) после конца найденного периода. Запросов столько,
+    сколько периодов в списке, и каждый читает одну строку индекса.
+    """
+
+    def aggregate(self, *args, **kwargs):
+        # MIN и MAX в одном запросе SQLite считает полным проходом,
+        # а по отдельности - одним чтением индекса.
+        if args or len(kwargs) < 2 or not all(
+            isinstance(value, (Min, Max)) for value in kwargs.values()
+        ):
+            return super().aggregate(*args, **kwargs)
+        result = {}
+        for alias, value in kwargs.items():
+            result.update(super().aggregate(**{alias: value}))
+        return result
+
+    def dates(self, field_name, kind, order='ASC'):
+        field = self.model._meta.get_field(field_name)
+        if kind not in ('year', 'month', 'day') or not isinstance(
+            field, DateTimeField
+        ):
+            return super().dates(field_name, kind, order=order)
+        periods = []
+        first = self.aggregate(first=Min(field_name))['first']
+        while first is not None:
+            if settings.USE_TZ:
+                first = timezone.localtime(first)
+            start, following = _period(first.date(), kind)
+            periods.append(start)
+            boundary = datetime.datetime.combine(following, datetime.time())
+            if settings.USE_TZ:
+                boundary = timezone.make_aware(boundary)
+            first = self.filter(
+                **{f'{field_name}__gte': boundary}
+            ).aggregate(first=Min(field_name))['first']
+        if order == 'DESC':
+            periods.reverse()
+        return periods
+
+
+class GroupSelect(forms.Select):
+    """Select групп для list_editable без шаблонов виджета.
+
+    Шаблонный Select рендерит каждый <option> отдельным шаблоном, и при
+    сотне строк с десятками групп это секунды на страницу.
+    """
+
+    def render(self, name, value, attrs=None, renderer=None):
+        attrs = self.build_attrs(self.attrs, attrs)
+        value = '' if value is None else str(value)
+        options = ''.join(
+            format_html(
+                '<option value="{}"{}>{}</option>',
+                key,
+                mark_safe(' selected') if str(key) == value else '',
+                label,
+            )
+            for key, label in self.choices
+        )
+        return format_html(
+            '<select name="{}"{}>{}</select>',
+            name,
+            flatatt(attrs),
+            mark_safe(options),
+        )
+
+
+class PostAdminPaginator(CachedCountPaginator):
+    """Paginator списка постов в админке.
+
+    Без фильтров и поиска число постов берётся из того же кэша, что и
+    у главной страницы, а после PAGINATOR_ESTIMATE_THRESHOLD - оценкой
+    по Max(pk). Отфильтрованные списки кэшируются по тексту запроса.
+    """
+
+    def __init__(self, object_list, per_page, orphans=0,
+                 allow_empty_first_page=True):
+        if object_list.query.where:
+            try:
+                sql = str(object_list.order_by().query)
+            except EmptyResultSet:
+                sql = ''
+            scope = count_scope(
+                'admin', hashlib.md5(sql.encode()).hexdigest()
+            )
+        else:
+            scope = count_scope('global')
+        super().__init__(
+            object_list,
+            per_page,
+            scope,
+            orphans=orphans,
+            allow_empty_first_page=allow_empty_first_page,
+        )
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -13,9 +137,43 @@ class PostAdmin(admin.ModelAdmin):
         'group',
     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
     empty_value_display = '-пусто-'
+    paginator = PostAdminPaginator
+    # Иначе под списком считается COUNT(*) по всей таблице.
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return PostAdminQuerySet(
+            model=queryset.model, query=queryset.query, using=queryset.db
+        )
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'group':
+            kwargs['widget'] = GroupSelect
+        field = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        if db_field.name == 'group':
+            # Один запрос групп на всю страницу, а не на каждую строку.
+            choices = getattr(request, '_post_group_choices', None)
+            if choices is None:
+                choices = request._post_group_choices = list(field.choices)
+            field.choices = choices
+        return field
+
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по тексту через индекс FTS5 вместо LIKE '%...%'."""
+        if not search_term or not search_available():
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        # Все совпадения, а не SEARCH_CANDIDATES лучших, как на сайте:
+        # список в админке сортируется по дате и должен быть полным.
+        results = SearchResults(search_term)
+        return results.filter_queryset(queryset), False
 
 
 admin.site.register(Post, PostAdmin)
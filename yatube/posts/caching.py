@@ -0,0 +1,91 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+GENERATION_KEY = 'generation:{}'
+PAGE_KEY = 'page:{}:{}:{}:{}'
+
+
+def _initial_generation():
+    # Если счётчик вытеснен из кэша, он не должен вернуться к значению,
+    # под которым ещё лежат старые страницы.
+    return int(time.time() * 1000)
+
+
+def get_generations(names):
+    """Текущие поколения для имён вида 'posts', 'group:slug'."""
+    keys = [GENERATION_KEY.format(name) for name in names]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, _initial_generation(), None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def bump_generation(*names):
+    """Сдвигает поколения, после чего закэшированные страницы устаревают."""
+    for name in names:
+        key = GENERATION_KEY.format(name)
+        cache.add(key, _initial_generation(), None)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_generation(), None)
+
+
+def group_generation(slug):
+    return f'group:{slug}'
+
+
+def author_generation(user_id):
+    # Ключ по id, а не по имени: имя может быть не ASCII, что не
+    # годится для ключей memcached, и может смениться.
+    return f'author:{user_id}'
+
+
+def group_page_generations(slug):
+    return (group_generation(slug), 'groups', 'users')
+
+
+def profile_page_generations(username):
+    user_id = get_user_model().objects.filter(
+        username=username
+    ).values_list('pk', flat=True).first()
+    return (author_generation(user_id), 'groups', 'users')
+
+
+def _viewer(request):
+    user = request.user
+    return f'user{user.pk}' if user.is_authenticated else 'anon'
+
+
+def cache_page_by_generation(timeout, key_prefix, generations):
+    """Кэширует GET-ответ view, пока не сдвинутся его поколения.
+
+    generations — список имён или функция, получающая аргументы
+    view и возвращающая такой список. Ответ зависит от пользователя
+    (шапка, кнопки), поэтому ключ учитывает, кто смотрит страницу.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            names = generations
+            if callable(generations):
+                names = generations(*args, **kwargs)
+            version = '.'.join(map(str, get_generations(names)))
+            path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            key = PAGE_KEY.format(key_prefix, version, _viewer(request), path)
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200 and not response.streaming:
+                    cache.set(key, response, timeout)
+            return response
+        return wrapper
+    return decorator
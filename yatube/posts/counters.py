@@ -0,0 +1,87 @@
+from django.db import transaction
+from django.db.models import Count, F, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, Profile, User
+
+
+def bump(user_id, **deltas):
+    """Атомарно меняет счётчики профиля: bump(1, post_count=1).
+
+    Уменьшение не уходит ниже нуля, профиль создаётся при первом
+    увеличении, если его ещё нет.
+    """
+    for field, delta in deltas.items():
+        profiles = Profile.objects.filter(user_id=user_id)
+        if delta < 0:
+            profiles = profiles.filter(**{f'{field}__gte': -delta})
+        if profiles.update(**{field: F(field) + delta}) or delta < 0:
+            continue
+        Profile.objects.get_or_create(user_id=user_id)
+        Profile.objects.filter(user_id=user_id).update(
+            **{field: F(field) + delta}
+        )
+
+
+def bump_comments(post_id, delta):
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(comment_count__gte=-delta)
+    posts.update(comment_count=F('comment_count') + delta)
+
+
+def _count(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+                field
+            ).annotate(total=Count('pk')).values('total')
+        ),
+        0,
+    )
+
+
+def recount_profiles(first_id, last_id):
+    """Пересчитывает счётчики профилей пользователей из диапазона id."""
+    user_ids = User.objects.filter(
+        pk__range=(first_id, last_id)
+    ).values_list('pk', flat=True)
+    Profile.objects.bulk_create(
+        (Profile(user_id=user_id) for user_id in user_ids),
+        ignore_conflicts=True,
+    )
+    return Profile.objects.filter(
+        user_id__gte=first_id,
+        user_id__lte=last_id,
+    ).update(
+        post_count=_count(Post.objects.all(), 'author'),
+        follower_count=_count(Follow.objects.all(), 'author'),
+        following_count=_count(Follow.objects.all(), 'user'),
+    )
+
+
+def recount_followers(user_ids):
+    """Пересчитывает follower_count профилей пользователей user_ids."""
+    return Profile.objects.filter(user_id__in=user_ids).update(
+        follower_count=_count(Follow.objects.all(), 'author')
+    )
+
+
+def recount_comments(first_id, last_id):
+    """Пересчитывает comment_count постов из диапазона id."""
+    return Post.objects.filter(
+        pk__range=(first_id, last_id)
+    ).update(comment_count=_count(Comment.objects.all(), 'post'))
+
+
+def recount_all(batch_size):
+    """Пересчитывает все счётчики пачками; возвращает (профилей, постов)."""
+    totals = []
+    for model, recount in ((User, recount_profiles), (Post, recount_comments)):
+        last_id = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        total = 0
+        for first_id in range(1, last_id + 1, batch_size):
+            with transaction.atomic():
+                total += recount(first_id, first_id + batch_size - 1)
+        totals.append(total)
+    return tuple(totals)
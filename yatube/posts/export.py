@@ -0,0 +1,149 @@
+import csv
+import datetime
+import json
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Comment, Follow, Post
+
+FORMATS = ('jsonl', 'csv')
+CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+# Сколько строк драйвер БД отдаёт за раз при обходе таблицы.
+CHUNK_SIZE = 2000
+
+# Для каждого вида выгрузки: модель, поля (имя в файле -> поле модели)
+# и поля модели, по которым работают фильтры author, group и дат.
+EXPORTS = {
+    'posts': {
+        'model': Post,
+        'fields': {
+            'id': 'id',
+            'text': 'text',
+            'author': 'author__username',
+            'group': 'group__slug',
+            'pub_date': 'pub_date',
+            'image': 'image',
+        },
+        'author': 'author__username',
+        'group': 'group__slug',
+        'date': 'pub_date',
+    },
+    'comments': {
+        'model': Comment,
+        'fields': {
+            'id': 'id',
+            'post': 'post_id',
+            'author': 'author__username',
+            'text': 'text',
+            'created': 'created',
+        },
+        'author': 'author__username',
+        'group': 'post__group__slug',
+        'date': 'created',
+    },
+    'follows': {
+        'model': Follow,
+        'fields': {
+            'id': 'id',
+            'user': 'user__username',
+            'author': 'author__username',
+        },
+        'author': 'author__username',
+        'group': None,
+        'date': None,
+    },
+}
+
+
+class ExportError(ValueError):
+    pass
+
+
+def _moment(value, name):
+    """Начало суток для даты или сам момент для даты со временем."""
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            if day is not None:
+                moment = datetime.datetime.combine(day, datetime.time())
+    except ValueError:
+        moment = None
+    if moment is None:
+        raise ExportError(f'Неверная дата {name}: {value!r}')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def export_queryset(kind, author=None, group=None, since=None, until=None):
+    """Строки выгрузки kind как values_list() с фильтрами.
+
+    since включается, until - нет: выгрузки за соседние периоды
+    не пересекаются.
+    """
+    try:
+        export = EXPORTS[kind]
+    except KeyError:
+        raise ExportError(f'Неизвестная выгрузка: {kind!r}')
+    lookups = {}
+    for name, value in (('author', author), ('group', group)):
+        if not value:
+            continue
+        if export[name] is None:
+            raise ExportError(
+                f'Выгрузку {kind} нельзя фильтровать по {name}'
+            )
+        lookups[export[name]] = value
+    for name, value, lookup in (('since', since, 'gte'),
+                                ('until', until, 'lt')):
+        if not value:
+            continue
+        if export['date'] is None:
+            raise ExportError(f'У выгрузки {kind} нет дат')
+        lookups[f'{export["date"]}__{lookup}'] = _moment(value, name)
+    return export['model'].objects.filter(**lookups).order_by(
+        'pk'
+    ).values_list(*export['fields'].values())
+
+
+def export_rows(kind, queryset):
+    """Словари строк выгрузки, прочитанные курсором БД по CHUNK_SIZE.
+
+    Выгрузка не загружается в память целиком, сколько бы строк
+    ни было в таблице.
+    """
+    names = list(EXPORTS[kind]['fields'])
+    for values in queryset.iterator(chunk_size=CHUNK_SIZE):
+        yield {
+            name: value.isoformat()
+            if isinstance(value, datetime.datetime) else value
+            for name, value in zip(names, values)
+        }
+
+
+class _Echo:
+    """Файл для csv.writer, который возвращает строку, а не пишет её."""
+
+    def write(self, value):
+        return value
+
+
+def export_lines(kind, queryset, export_format):
+    """Строки файла выгрузки в формате jsonl или csv."""
+    rows = export_rows(kind, queryset)
+    if export_format == 'jsonl':
+        for row in rows:
+            yield json.dumps(row, ensure_ascii=False) + '\n'
+        return
+    writer = csv.writer(_Echo())
+    fields = list(EXPORTS[kind]['fields'])
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([
+            '' if row[name] is None else row[name] for name in fields
+        ])
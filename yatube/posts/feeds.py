@@ -0,0 +1,323 @@
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+
+from core.tasks import task
+
+from .models import Follow, Post, Profile, Timeline
+from .utils import cached_count, count_scope, forget_counts
+
+PULL_AUTHORS_KEY = 'feed:pull_authors'
+RECENT_POSTS_KEY = 'feed:recent:{}'
+
+
+def _insert(user_ids, rows):
+    """Вставляет пары (post_id, pub_date) в ленты читателей пачками."""
+    batch = []
+    for user_id in user_ids:
+        for post_id, pub_date in rows:
+            batch.append(
+                Timeline(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            )
+            if len(batch) >= settings.TIMELINE_BATCH_SIZE:
+                Timeline.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+    if batch:
+        Timeline.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def pull_authors():
+    """Авторы, у которых подписчиков больше FEED_PULL_THRESHOLD.
+
+    Их посты не раскладываются по лентам, а подмешиваются при чтении.
+    """
+    def compute():
+        return frozenset(
+            Profile.objects.filter(
+                follower_count__gt=settings.FEED_PULL_THRESHOLD
+            ).values_list('user_id', flat=True)
+        )
+    return cache.get_or_set(
+        PULL_AUTHORS_KEY, compute, settings.FEED_PULL_AUTHORS_CACHE_TIME
+    )
+
+
+def recent_posts(author_ids):
+    """Свежие посты pull-авторов: {author_id: [(pub_date, post_id), ...]}.
+
+    Списки лежат в кэше и сбрасываются при создании и удалении постов.
+    """
+    keys = {RECENT_POSTS_KEY.format(pk): pk for pk in author_ids}
+    found = cache.get_many(keys)
+    result = {keys[key]: rows for key, rows in found.items()}
+    missing = {}
+    for key, author_id in keys.items():
+        if key in found:
+            continue
+        rows = list(
+            Post.objects.filter(author_id=author_id).order_by(
+                '-pub_date', '-id'
+            ).values_list('pub_date', 'id')[:settings.FEED_PULL_LIMIT]
+        )
+        result[author_id] = missing[key] = rows
+    if missing:
+        cache.set_many(missing, settings.FEED_PULL_CACHE_TIME)
+    return result
+
+
+def forget_recent_posts(author_id):
+    cache.delete(RECENT_POSTS_KEY.format(author_id))
+
+
+@task(name='posts.forget_follow_counts')
+def forget_follow_counts(author_id):
+    """Сбрасывает кэш числа постов в лентах подписчиков автора.
+
+    Подписчиков pull-автора это не касается: в кэше лежит только
+    число постов их Timeline, а посты pull-авторов HybridFeed
+    досчитывает при каждом чтении.
+    """
+    if author_id in pull_authors():
+        return
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    forget_counts(*(
+        count_scope('follow', pk) for pk in followers.iterator()
+    ))
+
+
+@task(name='posts.fan_out_post')
+def fan_out(post_id):
+    """Задача очереди: раскладывает пост по лентам подписчиков автора."""
+    row = Post.objects.filter(pk=post_id).values_list(
+        'author_id', 'pub_date'
+    ).first()
+    if row is None:
+        return
+    author_id, pub_date = row
+    if author_id not in pull_authors():
+        followers = Follow.objects.filter(
+            author_id=author_id
+        ).values_list('user_id', flat=True).distinct()
+        _insert(followers.iterator(), [(post_id, pub_date)])
+    forget_follow_counts(author_id)
+
+
+def fan_out_post(post):
+    """Ставит раскладку нового поста по лентам в очередь задач.
+
+    До десятков тысяч вставок в Timeline не держат запрос автора.
+    Свежие посты pull-автора сбрасываются сразу: их читают при
+    каждом открытии ленты.
+    """
+    forget_recent_posts(post.author_id)
+    fan_out.delay(post.pk, dedupe_key=f'fan-out:{post.pk}')
+
+
+def add_author(user_id, author_id):
+    """Добавляет посты автора в ленту нового подписчика."""
+    add_authors(user_id, [author_id])
+
+
+def add_authors(user_id, author_ids):
+    """Добавляет посты нескольких авторов в ленту одним запросом."""
+    author_ids = set(author_ids) - pull_authors()
+    if not author_ids:
+        return
+    rows = Post.objects.filter(
+        author_id__in=author_ids
+    ).values_list('id', 'pub_date')
+    _insert([user_id], rows.iterator())
+
+
+@task(name='posts.push_author')
+def push_author(author_id):
+    """Задача очереди: добавляет все посты автора в ленты подписчиков."""
+    if author_id in pull_authors():
+        return
+    rows = list(
+        Post.objects.filter(author_id=author_id).values_list('id', 'pub_date')
+    )
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    _insert(followers.iterator(), rows)
+    forget_follow_counts(author_id)
+
+
+def leave_pull(author_id):
+    """Раскладывает посты автора, переставшего быть pull-автором.
+
+    Пока у автора было больше FEED_PULL_THRESHOLD подписчиков, его
+    посты не попадали в ленты, а новые подписчики не получали старых
+    постов. Когда подписчиков становится не больше порога, все посты
+    автора добавляются в ленты всех его подписчиков задачей очереди.
+    Возвращает True, если автор покинул pull-набор.
+    """
+    if author_id not in pull_authors():
+        return False
+    if Profile.objects.filter(
+        user_id=author_id,
+        follower_count__gt=settings.FEED_PULL_THRESHOLD,
+    ).exists():
+        return False
+    cache.delete(PULL_AUTHORS_KEY)
+    forget_recent_posts(author_id)
+    push_author.delay(author_id, dedupe_key=f'push-author:{author_id}')
+    return True
+
+
+def remove_author(user_id, author_id):
+    """Убирает посты автора из ленты отписавшегося читателя."""
+    Timeline.objects.filter(
+        user_id=user_id,
+        post__author_id=author_id,
+    ).delete()
+
+
+def rebuild_timeline(user_id):
+    """Пересобирает ленту читателя с нуля по его подпискам."""
+    rows = Post.objects.filter(
+        author__following__user_id=user_id
+    ).exclude(
+        author_id__in=pull_authors()
+    ).values_list('id', 'pub_date').distinct()
+    with transaction.atomic():
+        Timeline.objects.filter(user_id=user_id).delete()
+        _insert([user_id], rows.iterator())
+
+
+class HybridFeed:
+    """Лента подписок, собранная из push- и pull-частей.
+
+    Разложенная лента читателя и списки свежих постов pull-авторов
+    сливаются heap merge по (pub_date, id). Объект понимает count()
+    и срезы, поэтому его принимает Paginator, а fetch_keyset даёт
+    ту же ленту для CursorPaginator.
+    """
+    model = Post
+
+    def __init__(self, user, author_ids):
+        self.user = user
+        self.author_ids = author_ids
+
+    def count(self):
+        """Посты Timeline (из кэша области ленты) и свежие посты
+        pull-авторов, которых в Timeline нет.
+
+        Посты автора, разложенные до того, как он стал pull-автором,
+        лежат и в Timeline, и в списке свежих - их не считаем дважды.
+        """
+        timeline = self._timeline()
+        total = cached_count(
+            count_scope('follow', self.user.pk), timeline.count
+        )
+        pulled = {post_id for rows in self._pulled() for _, post_id in rows}
+        if pulled:
+            pulled.difference_update(
+                timeline.filter(post_id__in=pulled).values_list(
+                    'post_id', flat=True
+                )
+            )
+        return total + len(pulled)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        rows = self._timeline().order_by(
+            '-pub_date', F('post_id').desc()
+        ).values_list('pub_date', 'post_id')[:index.stop]
+        return self._posts(islice(
+            self._merge(rows, self._pulled(), reverse=True),
+            start,
+            index.stop,
+        ))
+
+    def fetch_keyset(self, key, reverse, limit):
+        """До limit постов строго после key (или до него при reverse)."""
+        rows = self._timeline()
+        pulled = self._pulled()
+        if key is not None:
+            key = tuple(key)
+            if reverse:
+                condition = Q(pub_date__gte=key[0]) & (
+                    Q(pub_date__gt=key[0]) | Q(post_id__gt=key[1])
+                )
+                pulled = [[row for row in lst if row > key] for lst in pulled]
+            else:
+                condition = Q(pub_date__lte=key[0]) & (
+                    Q(pub_date__lt=key[0]) | Q(post_id__lt=key[1])
+                )
+                pulled = [[row for row in lst if row < key] for lst in pulled]
+            rows = rows.filter(condition)
+        if reverse:
+            ordering = ('pub_date', F('post_id').asc())
+        else:
+            ordering = ('-pub_date', F('post_id').desc())
+        rows = rows.order_by(*ordering).values_list('pub_date', 'post_id')
+        if reverse:
+            pulled = [lst[::-1] for lst in pulled]
+        return self._posts(islice(
+            self._merge(rows[:limit], pulled, reverse=not reverse),
+            limit,
+        ))
+
+    def _timeline(self):
+        return Timeline.objects.filter(user=self.user)
+
+    def _pulled(self):
+        return list(recent_posts(self.author_ids).values())
+
+    @staticmethod
+    def _merge(rows, pulled, reverse):
+        seen = set()
+        for pub_date, post_id in heapq.merge(rows, *pulled, reverse=reverse):
+            if post_id not in seen:
+                seen.add(post_id)
+                yield pub_date, post_id
+
+    @staticmethod
+    def _posts(rows):
+        ids = [post_id for _, post_id in rows]
+        posts = Post.objects.select_related(
+            'author',
+            'group',
+        ).in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def follow_feed(user):
+    """Лента подписок читателя.
+
+    Обычно это один проход по индексу (user, pub_date) таблицы
+    Timeline; если среди подписок есть pull-авторы, возвращается
+    HybridFeed.
+    """
+    pulled = pull_authors()
+    if pulled:
+        pulled = pulled.intersection(
+            Follow.objects.filter(user=user).values_list(
+                'author_id', flat=True
+            )
+        )
+    if pulled:
+        return HybridFeed(user, sorted(pulled))
+    return Post.objects.select_related(
+        'author',
+        'group',
+    ).filter(
+        timelines__user=user
+    ).order_by(
+        '-timelines__pub_date',
+        # F() обходит подстановку Post.Meta.ordering для внешнего ключа.
+        F('timelines__post_id').desc(),
+    )
@@ -0,0 +1,124 @@
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+
+from . import counters, feeds
+from .caching import author_generation, bump_generation
+from .models import Follow
+from .utils import count_scope, forget_counts
+
+
+def _sql(template):
+    ops = connection.ops
+    return template.format(
+        table=ops.quote_name(Follow._meta.db_table),
+        user=ops.quote_name(Follow._meta.get_field('user').column),
+        author=ops.quote_name(Follow._meta.get_field('author').column),
+        insert=ops.insert_statement(ignore_conflicts=True),
+        suffix=ops.ignore_conflicts_suffix_sql(ignore_conflicts=True),
+    )
+
+
+def follow(user, author):
+    """Подписывает user на author одним INSERT без гонок.
+
+    Повторная или одновременная подписка упирается в unique_follow и
+    ничего не вставляет (INSERT OR IGNORE / ON CONFLICT DO NOTHING).
+    post_save для счётчиков и ленты отправляется, только если строка
+    действительно добавлена; pk у переданного в сигнал объекта нет.
+    Возвращает, появилась ли подписка.
+    """
+    if user.pk == author.pk:
+        return False
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                _sql(
+                    '{insert} {table} ({user}, {author}) '
+                    'VALUES (%s, %s) {suffix}'
+                ),
+                [user.pk, author.pk],
+            )
+            created = cursor.rowcount == 1
+        if created:
+            post_save.send(
+                sender=Follow,
+                instance=Follow(user=user, author=author),
+                created=True,
+                update_fields=None,
+                raw=False,
+                using=connection.alias,
+            )
+    return created
+
+
+def unfollow(user, author):
+    """Отписывает user от author одним DELETE.
+
+    Если подписки уже нет, ничего не происходит. post_delete
+    отправляется только тем запросом, который удалил строку, поэтому
+    одновременные отписки не уменьшают счётчики дважды.
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                _sql(
+                    'DELETE FROM {table} '
+                    'WHERE {user} = %s AND {author} = %s'
+                ),
+                [user.pk, author.pk],
+            )
+            deleted = cursor.rowcount > 0
+        if deleted:
+            post_delete.send(
+                sender=Follow,
+                instance=Follow(user=user, author=author),
+                using=connection.alias,
+            )
+    return deleted
+
+
+def follow_many(user, authors):
+    """Подписывает на несколько авторов сразу, например на предложенных
+    при регистрации. Возвращает новых авторов.
+
+    Все пары вставляются одним INSERT с пропуском конфликтов, а
+    счётчики, лента и поколения страниц обновляются по разу, без
+    post_save на каждую подписку. following_count растёт на число
+    вставленных строк, follower_count авторов пересчитывается по
+    таблице, так что одновременная подписка его не собьёт.
+    """
+    authors = list({
+        author.pk: author for author in authors if author.pk != user.pk
+    }.values())
+    if not authors:
+        return []
+    author_ids = [author.pk for author in authors]
+    with transaction.atomic():
+        existing = set(
+            Follow.objects.filter(
+                user=user, author_id__in=author_ids
+            ).values_list('author_id', flat=True)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                _sql(
+                    '{insert} {table} ({user}, {author}) VALUES '
+                    + ', '.join(['(%s, %s)'] * len(authors))
+                    + ' {suffix}'
+                ),
+                [pk for author_id in author_ids
+                 for pk in (user.pk, author_id)],
+            )
+            created = cursor.rowcount
+        if not created:
+            return []
+        new = [author for author in authors if author.pk not in existing]
+        counters.bump(user.pk, following_count=created)
+        counters.recount_followers(author_ids)
+        feeds.add_authors(user.pk, [author.pk for author in new])
+        forget_counts(count_scope('follow', user.pk))
+        bump_generation(
+            author_generation(user.pk),
+            *(author_generation(author.pk) for author in new)
+        )
+    return new
@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from posts.caching import bump_generation
+from posts.models import Post
+from posts.thumbnails import image_metadata
+
+METADATA_FIELDS = [
+    'image_width',
+    'image_height',
+    'image_format',
+    'image_size',
+    'image_color',
+    'image_placeholder',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет размеры, формат, размер файла, основной цвет и '
+        'заглушку картинок постов, загруженных до появления этих полей.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--all', action='store_true', dest='recompute',
+            help='Пересчитать метаданные всех картинок.',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').only(
+            'image', 'card_version', *METADATA_FIELDS
+        ).order_by('pk')
+        if not options['recompute']:
+            posts = posts.filter(image_width__isnull=True)
+        last_id = 0
+        updated = missing = 0
+        while True:
+            batch = list(posts.filter(pk__gt=last_id)[:options['batch_size']])
+            if not batch:
+                break
+            last_id = batch[-1].pk
+            changed = []
+            for post in batch:
+                try:
+                    with post.image.open('rb') as file:
+                        metadata = image_metadata(file)
+                except (OSError, ValueError):
+                    missing += 1
+                    continue
+                for field, value in metadata.items():
+                    setattr(post, field, value)
+                post.card_version = F('card_version') + 1
+                changed.append(post)
+            Post.objects.bulk_update(
+                changed, METADATA_FIELDS + ['card_version']
+            )
+            updated += len(changed)
+        if updated:
+            # 'groups' входит в поколения всех лент, так что все
+            # закэшированные страницы перерисуются с новыми карточками.
+            bump_generation('posts', 'groups')
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено картинок: {updated}, не прочитано: {missing}'
+        ))
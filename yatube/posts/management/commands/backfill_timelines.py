@@ -0,0 +1,45 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.feeds import rebuild_timeline
+from posts.models import Follow
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет ленты подписок заново. Без аргументов обходит всех '
+        'читателей с подписками, с --user пересобирает выбранные ленты.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            action='append',
+            dest='usernames',
+            metavar='USERNAME',
+            help='Пересобрать ленту только этого пользователя.',
+        )
+
+    def handle(self, *args, **options):
+        usernames = options['usernames']
+        if usernames:
+            user_ids = list(
+                User.objects.filter(
+                    username__in=usernames
+                ).values_list('id', flat=True)
+            )
+            if len(user_ids) != len(set(usernames)):
+                raise CommandError('Часть пользователей не найдена.')
+        else:
+            user_ids = Follow.objects.values_list(
+                'user_id', flat=True
+            ).distinct().order_by('user_id').iterator()
+        rebuilt = 0
+        for user_id in user_ids:
+            rebuild_timeline(user_id)
+            rebuilt += 1
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересобрано лент: {rebuilt}')
+        )
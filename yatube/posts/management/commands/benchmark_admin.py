@@ -0,0 +1,66 @@
+import time
+
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from posts.models import Post, User
+from posts.search import rebuild_index
+from posts.synthetic import synthetic_dataset
+
+
+def admin_pages(dataset):
+    """Страницы списка постов в админке, которые меряет команда."""
+    year = dataset['post'].pub_date.year
+    return {
+        'список': {},
+        'страница 50': {'p': 49},
+        'фильтр по году': {'pub_date__year': year},
+        'фильтр по группе': {'group__id__exact': dataset['group'].id},
+        'поиск': {'q': 'post 12345'},
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Меряет время и число запросов страниц списка постов в админке '
+        'на синтетических данных, например: --posts 1000000.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        model_admin = admin.site._registry[Post]
+        factory = RequestFactory()
+        with synthetic_dataset(
+            options['posts'], users=options['users'], groups=options['groups']
+        ) as dataset:
+            user = User.objects.create_superuser(
+                'benchmark_admin', 'admin@example.com', 'password'
+            )
+            rebuild_index(10000)
+            cache.clear()
+            for name, params in admin_pages(dataset).items():
+                timings = []
+                for _ in range(max(1, options['repeat'])):
+                    request = factory.get('/admin/posts/post/', params)
+                    request.user = user
+                    # Лог запросов ограничен, а после наполнения базы
+                    # он уже полон и CaptureQueriesContext видит 0.
+                    reset_queries()
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        model_admin.changelist_view(request).render()
+                        timings.append(time.perf_counter() - started)
+                self.stdout.write(
+                    f'{name:<18} первый {timings[0] * 1000:8.1f} мс, '
+                    f'лучший {min(timings) * 1000:8.1f} мс, '
+                    f'запросов {len(queries)}'
+                )
@@ -0,0 +1,82 @@
+import re
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.feeds import follow_feed
+from posts.models import Follow, Post
+from posts.synthetic import synthetic_dataset
+from posts.utils import CursorPaginator
+
+# Полный проход по таблице без индекса или сортировка во временном B-дереве.
+REGRESSION = re.compile(r'SCAN (TABLE )?\w+$|USE TEMP B-TREE')
+
+
+def feed_queries(dataset):
+    """Запросы, которые делают view из posts/views.py."""
+    group = dataset['group']
+    author = dataset['author']
+    reader = dataset['reader']
+    post = dataset['post']
+    per_page = settings.NUM_MSG
+    index = Post.objects.select_related('author', 'group')
+    cursor = CursorPaginator(index, per_page)
+    middle = index[per_page * 5]
+    return {
+        'index': index[:per_page],
+        'index: count': index.order_by().values('pk'),
+        'index: cursor': cursor.object_list.filter(
+            cursor._keyset_q([middle.pub_date, middle.pk], reverse=False)
+        ).order_by(*cursor.ordering)[:per_page + 1],
+        'group_list': group.posts.select_related('author')[:per_page],
+        'group_list: count': group.posts.order_by().values('pk'),
+        'profile': author.posts.select_related('author')[:per_page],
+        'profile: count': author.posts.order_by().values('pk'),
+        'profile: following': Follow.objects.filter(
+            author=author, user=reader
+        )[:1],
+        'follow_index': follow_feed(reader)[:per_page],
+        'post_detail: comments': post.comments.order_by('created'),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Печатает EXPLAIN QUERY PLAN запросов лент на синтетических '
+        'данных и отмечает полные сканы и сортировки во временном B-дереве.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument(
+            '--strict',
+            action='store_true',
+            help='Завершиться с ошибкой, если найдены регрессии.',
+        )
+
+    def handle(self, *args, **options):
+        regressions = []
+        with synthetic_dataset(
+            options['posts'], users=options['users'], groups=options['groups']
+        ) as dataset:
+            for name, queryset in feed_queries(dataset).items():
+                plan = queryset.explain()
+                self.stdout.write(self.style.MIGRATE_HEADING(name))
+                for line in plan.splitlines():
+                    if REGRESSION.search(line):
+                        regressions.append(name)
+                        line = self.style.ERROR(line)
+                    self.stdout.write(f'  {line}')
+        if regressions:
+            message = 'Регрессии в планах: ' + ', '.join(
+                sorted(set(regressions))
+            )
+            if options['strict']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(
+                self.style.SUCCESS('Все запросы идут по индексам')
+            )
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import (
+    EXPORTS,
+    FORMATS,
+    ExportError,
+    export_lines,
+    export_queryset,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты, комментарии или подписки в JSONL или CSV '
+        'потоком, не загружая таблицу в память. Выгрузка постов в JSONL '
+        'подходит для import_posts.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(EXPORTS))
+        parser.add_argument('--format', choices=FORMATS, default='jsonl')
+        parser.add_argument('--author', help='Username автора.')
+        parser.add_argument('--group', help='Slug группы.')
+        parser.add_argument('--since', help='С даты (включительно).')
+        parser.add_argument('--until', help='До даты (не включая).')
+        parser.add_argument(
+            '--output', '-o',
+            help='Файл выгрузки; по умолчанию - stdout.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            queryset = export_queryset(
+                options['kind'],
+                author=options['author'],
+                group=options['group'],
+                since=options['since'],
+                until=options['until'],
+            )
+        except ExportError as error:
+            raise CommandError(error)
+        lines = export_lines(options['kind'], queryset, options['format'])
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8',
+                  newline='') as file:
+            file.writelines(lines)
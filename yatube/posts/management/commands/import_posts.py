@@ -0,0 +1,290 @@
+import csv
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils._os import safe_join
+from django.utils.dateparse import parse_datetime
+
+from posts.caching import bump_generation
+from posts.feeds import forget_recent_posts
+from posts.management.progress import load_checkpoint, rate, save_checkpoint
+from posts.models import Group, Post, User
+from posts.search import search_available
+from posts.utils import count_scope, forget_counts
+
+FORMATS = ('jsonl', 'csv')
+
+
+@contextmanager
+def explicit_pub_date():
+    """Отключает auto_now_add у Post.pub_date, чтобы сохранить даты архива."""
+    field = Post._meta.get_field('pub_date')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+class RowError(ValueError):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает посты из JSONL или CSV (поля text, author, group, '
+        'pub_date, image) через bulk_create, минуя сигналы, и затем '
+        'пересобирает индексы, счётчики и ленты. С --checkpoint импорт '
+        'продолжается с места остановки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Файл с постами; '-' - stdin.")
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Формат входа; по умолчанию - по расширению файла.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Постов в одном bulk_create.',
+        )
+        parser.add_argument(
+            '--transaction-size', type=int, default=10000,
+            help='Постов в одной транзакции; после неё пишется checkpoint.',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл, где хранится число обработанных строк входа.',
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать сначала, не читая файл --checkpoint.',
+        )
+        parser.add_argument(
+            '--image-root',
+            help='Каталог, относительно которого указаны пути картинок.',
+        )
+        parser.add_argument(
+            '--create-users', action='store_true',
+            help='Создавать неизвестных авторов вместо пропуска строк.',
+        )
+        parser.add_argument(
+            '--skip-rebuild', action='store_true',
+            help='Не пересобирать индексы, счётчики и ленты после импорта.',
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        self.image_root = options['image_root']
+        self.create_users = options['create_users']
+        path = options['path']
+        input_format = options['format'] or self._guess_format(path)
+        checkpoint = options['checkpoint']
+        done = 0
+        if checkpoint and not options['restart']:
+            done = load_checkpoint(checkpoint)
+        self.users = dict(User.objects.values_list('username', 'id'))
+        self.groups = dict(Group.objects.values_list('slug', 'id'))
+        self.authors = set()
+        self.touched_groups = set()
+        self.imported = self.skipped = self.images = 0
+        batch_size = max(1, options['batch_size'])
+        transaction_size = max(batch_size, options['transaction_size'])
+        started = time.monotonic()
+        with self._open(path) as file, explicit_pub_date():
+            rows = islice(self._read(file, input_format), done, None)
+            while True:
+                chunk = list(islice(rows, transaction_size))
+                if not chunk:
+                    break
+                with transaction.atomic():
+                    for start in range(0, len(chunk), batch_size):
+                        self._insert(
+                            chunk[start:start + batch_size], done + start
+                        )
+                done += len(chunk)
+                if checkpoint:
+                    save_checkpoint(checkpoint, done)
+                self._report(started, done)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Постов: {self.imported} за {elapsed:.1f} с '
+            f'({rate(self.imported, elapsed)}/с); '
+            f'пропущено строк: {self.skipped}, картинок: {self.images}'
+        ))
+        if self.imported:
+            self._forget_caches()
+            if not options['skip_rebuild']:
+                self._rebuild()
+
+    def _insert(self, rows, first_number):
+        if self.create_users:
+            self._create_users(rows)
+        posts = []
+        for number, row in enumerate(rows, first_number + 1):
+            try:
+                posts.append(self._post(row))
+            except RowError as error:
+                self.skipped += 1
+                self.stderr.write(f'строка {number}: {error}')
+        # batch_size=None: SQLite сам делит вставку по лимиту параметров.
+        Post.objects.bulk_create(posts)
+        self.imported += len(posts)
+
+    def _post(self, row):
+        if not isinstance(row, dict):
+            raise RowError('не удалось разобрать запись')
+        text = (row.get('text') or '').strip()
+        if not text:
+            raise RowError('нет текста')
+        author_id = self.users.get(row.get('author') or '')
+        if author_id is None:
+            raise RowError(f'нет автора {row.get("author")!r}')
+        group_id = None
+        if row.get('group'):
+            group_id = self.groups.get(row['group'])
+            if group_id is None:
+                raise RowError(f'нет группы {row["group"]!r}')
+        post = Post(
+            text=text,
+            author_id=author_id,
+            group_id=group_id,
+            pub_date=self._pub_date(row.get('pub_date')),
+        )
+        if self.image_root and row.get('image'):
+            post.image = self._save_image(row['image'])
+        self.authors.add(author_id)
+        if group_id:
+            self.touched_groups.add(group_id)
+        return post
+
+    @staticmethod
+    def _pub_date(value):
+        if not value:
+            return timezone.now()
+        try:
+            pub_date = parse_datetime(value)
+        except ValueError:
+            pub_date = None
+        if pub_date is None:
+            raise RowError(f'неверная дата {value!r}')
+        if settings.USE_TZ and timezone.is_naive(pub_date):
+            pub_date = timezone.make_aware(pub_date, timezone.utc)
+        return pub_date
+
+    def _save_image(self, relative_path):
+        """Имя картинки в хранилище или '' без файла.
+
+        Хранилище адресует файлы по содержимому, так что повтор импорта
+        не плодит копии. Метаданные заполнит backfill_image_metadata.
+        """
+        try:
+            full_path = safe_join(self.image_root, relative_path)
+        except SuspiciousFileOperation:
+            raise RowError(f'картинка вне --image-root: {relative_path!r}')
+        if not os.path.isfile(full_path):
+            self.stderr.write(f'нет картинки {relative_path!r}')
+            return ''
+        field = Post._meta.get_field('image')
+        name = field.generate_filename(None, os.path.basename(full_path))
+        with open(full_path, 'rb') as file:
+            name = field.storage.save(name, File(file))
+        self.images += 1
+        return name
+
+    def _create_users(self, rows):
+        missing = {
+            row.get('author') for row in rows
+            if isinstance(row, dict) and row.get('author')
+        } - self.users.keys()
+        if not missing:
+            return
+        users = []
+        for username in missing:
+            user = User(username=username)
+            user.set_unusable_password()
+            users.append(user)
+        User.objects.bulk_create(users, ignore_conflicts=True)
+        self.users.update(
+            User.objects.filter(
+                username__in=missing
+            ).values_list('username', 'id')
+        )
+
+    def _forget_caches(self):
+        forget_counts(
+            count_scope('global'),
+            *(count_scope('author', pk) for pk in self.authors),
+            *(count_scope('group', pk) for pk in self.touched_groups),
+        )
+        for author_id in self.authors:
+            forget_recent_posts(author_id)
+        # 'users' входит в поколения всех страниц с постами.
+        bump_generation('posts', 'users')
+
+    def _rebuild(self):
+        """То, что при обычном сохранении делают сигналы поста."""
+        options = {'verbosity': self.verbosity, 'stdout': self.stdout}
+        if search_available():
+            call_command('rebuild_search_index', **options)
+        call_command('rebuild_tags', **options)
+        call_command('recount_counters', **options)
+        call_command('backfill_timelines', **options)
+        if self.images:
+            call_command('backfill_image_metadata', **options)
+
+    @staticmethod
+    def _guess_format(path):
+        extension = os.path.splitext(path)[1].lstrip('.').lower()
+        if extension in FORMATS:
+            return extension
+        if extension == 'json':
+            return 'jsonl'
+        raise CommandError('Не удалось угадать формат, укажите --format.')
+
+    @staticmethod
+    @contextmanager
+    def _open(path):
+        if path == '-':
+            yield sys.stdin
+            return
+        try:
+            file = open(path, encoding='utf-8', newline='')
+        except OSError as error:
+            raise CommandError(f'Не удалось открыть {path}: {error}')
+        with file:
+            yield file
+
+    @staticmethod
+    def _read(file, input_format):
+        """Записи входа по одной; непустая строка JSONL - одна запись."""
+        if input_format == 'csv':
+            yield from csv.DictReader(file)
+            return
+        for line in file:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+
+    def _report(self, started, done):
+        if self.verbosity < 2:
+            return
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'строк {done}: {self.imported} постов, '
+            f'{rate(self.imported, elapsed)}/с'
+        )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.search import rebuild_index, search_available
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет полнотекстовый индекс постов заново, например после '
+        'bulk_create или импорта, минуя сигналы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        if not search_available():
+            raise CommandError('Индекс FTS5 доступен только в SQLite.')
+        indexed = rebuild_index(options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Проиндексировано постов: {indexed}')
+        )
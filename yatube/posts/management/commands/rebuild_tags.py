@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts.tags import rebuild_tags
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет хештеги постов заново по их текстам, например после '
+        'миграции, bulk_create или импорта, минуя сигналы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        linked = rebuild_tags(options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Связей постов с тегами: {linked}')
+        )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import recount_all
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает денормализованные счётчики постов, подписчиков, '
+        'подписок и комментариев пачками по диапазонам id.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        profiles, posts = recount_all(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано профилей: {profiles}, постов: {posts}'
+        ))
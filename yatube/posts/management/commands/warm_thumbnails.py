@@ -0,0 +1,80 @@
+import os
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from core.management.pools import pool_map, worker_pool
+from posts.management.progress import load_checkpoint, rate, save_checkpoint
+from posts.models import Post
+from posts.thumbnails import FAILED, MISSING, SKIPPED, WARMED, warm_post
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт миниатюры и варианты картинок всех постов в пуле '
+        'процессов. Готовые файлы пропускаются, с --checkpoint прогрев '
+        'продолжается с места остановки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Число процессов; 1 - без пула.',
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл, где хранится id последнего обработанного поста.',
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать сначала, не читая файл --checkpoint.',
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        checkpoint = options['checkpoint']
+        last_id = 0
+        if checkpoint and not options['restart']:
+            last_id = load_checkpoint(checkpoint)
+        workers = max(1, options['workers'])
+        counts = Counter()
+        started = time.monotonic()
+        with worker_pool(workers) as pool:
+            while True:
+                rows = list(
+                    Post.objects.exclude(image='').filter(
+                        pk__gt=last_id
+                    ).order_by('pk').values_list(
+                        'pk', 'image', 'image_variants'
+                    )[:options['batch_size']]
+                )
+                if not rows:
+                    break
+                counts.update(pool_map(
+                    pool, warm_post, rows,
+                    chunksize=max(1, len(rows) // (workers * 4)),
+                ))
+                last_id = rows[-1][0]
+                if checkpoint:
+                    save_checkpoint(checkpoint, last_id)
+                self._report(counts, started, last_id)
+        total = sum(counts.values())
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Картинок: {total} за {elapsed:.1f} с '
+            f'({rate(total, elapsed)}/с); '
+            f'создано: {counts[WARMED]}, готово: {counts[SKIPPED]}, '
+            f'нет файла: {counts[MISSING]}, ошибок: {counts[FAILED]}'
+        ))
+
+    def _report(self, counts, started, last_id):
+        if self.verbosity < 2:
+            return
+        total = sum(counts.values())
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'до id {last_id}: {total} картинок, '
+            f'{rate(total, elapsed)}/с'
+        )
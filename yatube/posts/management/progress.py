@@ -0,0 +1,23 @@
+import os
+
+
+def rate(total, elapsed):
+    """Скорость для отчёта команды: объектов в секунду."""
+    return f'{total / elapsed:.1f}' if elapsed else '-'
+
+
+def load_checkpoint(path):
+    """Число из файла контрольной точки; 0, если файла ещё нет."""
+    try:
+        with open(path) as file:
+            return int(file.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def save_checkpoint(path, value):
+    """Атомарно записывает контрольную точку через временный файл."""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as file:
+        file.write(str(value))
+    os.replace(tmp_path, path)
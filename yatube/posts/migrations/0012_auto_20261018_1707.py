@@ -0,0 +1,69 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:07
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 1000
+
+
+def fill_timelines(apps, schema_editor):
+    """Раскладывает посты по лентам существующих подписок.
+
+    Без этого лента подписок пуста до ручного backfill_timelines.
+    Читатели обходятся диапазонами id, строки вставляются пачками.
+    """
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    Timeline = apps.get_model('posts', 'Timeline')
+    last_id = Follow.objects.aggregate(
+        last=models.Max('user_id')
+    )['last'] or 0
+    for first_id in range(1, last_id + 1, BATCH_SIZE):
+        rows = Post.objects.filter(
+            author__following__user_id__gte=first_id,
+            author__following__user_id__lte=first_id + BATCH_SIZE - 1,
+        ).values_list(
+            'author__following__user_id', 'id', 'pub_date'
+        ).distinct().order_by()
+        batch = []
+        for user_id, post_id, pub_date in rows.iterator():
+            batch.append(
+                Timeline(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            )
+            if len(batch) >= BATCH_SIZE:
+                Timeline.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        Timeline.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0011_follow'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Timeline',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timelines', to='posts.Post', verbose_name='Пост')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL, verbose_name='Читатель')),
+            ],
+            options={
+                'ordering': ['-pub_date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='timeline',
+            index=models.Index(fields=['user', '-pub_date', '-post'], name='timeline_user_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timeline',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='unique_timeline_post'),
+        ),
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models.functions import Coalesce
+
+BATCH_SIZE = 1000
+
+
+def _count(model, field):
+    totals = model.objects.filter(
+        **{field: models.OuterRef('pk')}
+    ).order_by().values(field).annotate(total=models.Count('pk'))
+    return Coalesce(models.Subquery(totals.values('total')), 0)
+
+
+def fill_counters(apps, schema_editor):
+    """Создаёт профили и считает начальные значения счётчиков.
+
+    Без этого у существующих пользователей пустые счётчики, а первое
+    изменение начинает отсчёт с нуля. Пользователи и посты обходятся
+    диапазонами id.
+    """
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    Profile = apps.get_model('posts', 'Profile')
+    last_id = User.objects.aggregate(last=models.Max('pk'))['last'] or 0
+    for first_id in range(1, last_id + 1, BATCH_SIZE):
+        user_ids = User.objects.filter(
+            pk__range=(first_id, first_id + BATCH_SIZE - 1)
+        ).values_list('pk', flat=True)
+        Profile.objects.bulk_create(
+            (Profile(user_id=user_id) for user_id in user_ids),
+            ignore_conflicts=True,
+        )
+        Profile.objects.filter(
+            user_id__gte=first_id,
+            user_id__lte=first_id + BATCH_SIZE - 1,
+        ).update(
+            post_count=_count(Post, 'author'),
+            follower_count=_count(Follow, 'author'),
+            following_count=_count(Follow, 'user'),
+        )
+    last_id = Post.objects.aggregate(last=models.Max('pk'))['last'] or 0
+    for first_id in range(1, last_id + 1, BATCH_SIZE):
+        Post.objects.filter(
+            pk__range=(first_id, first_id + BATCH_SIZE - 1)
+        ).update(comment_count=_count(Comment, 'post'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0013_auto_20261018_1709'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Profile',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='profile', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('post_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('follower_count', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Подписок')),
+            ],
+            options={
+                'verbose_name': 'Профиль',
+                'verbose_name_plural': 'Профили',
+            },
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Комментариев'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['follower_count'], name='profile_follower_count_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
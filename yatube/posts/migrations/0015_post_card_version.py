@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_auto_20261018_1712'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='card_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Версия карточки'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations
+
+
+def create_index(apps, schema_editor):
+    # Полнотекстовый индекс FTS5 есть только в SQLite.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    # Индексы префиксов из 2 и 3 символов ускоряют поиск «сло*».
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE IF NOT EXISTS posts_post_fts USING fts5('
+        "text, prefix = '2 3', tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    # «ё» приводится к «е»: unicode61 снимает диакритику только с латиницы.
+    schema_editor.execute(
+        'INSERT INTO posts_post_fts(rowid, text) '
+        "SELECT id, REPLACE(REPLACE(text, 'ё', 'е'), 'Ё', 'Е') "
+        'FROM posts_post'
+    )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_post_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_post_image_placeholder'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
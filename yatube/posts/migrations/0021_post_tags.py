@@ -0,0 +1,110 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:47
+
+import re
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 1000
+# Сколько имён искать одним запросом: SQLite ограничивает число
+# параметров запроса.
+LOOKUP_BATCH_SIZE = 500
+TAG_RE = re.compile(r'(?<![\w&/#])#(\w+)')
+TAG_MAX_LENGTH = 50
+
+
+def _extract_tags(text):
+    names = []
+    for word in TAG_RE.findall(text):
+        name = word.lower().replace('ё', 'е')
+        if name.isdigit() or len(name) > TAG_MAX_LENGTH or name in names:
+            continue
+        names.append(name)
+        if len(names) == settings.TAG_MAX_PER_POST:
+            break
+    return names
+
+
+def fill_tags(apps, schema_editor):
+    """Разбирает хештеги существующих постов.
+
+    Без этого ссылки на теги в старых постах ведут на пустую ленту
+    или 404 до ручного rebuild_tags. Посты обходятся диапазонами id.
+    """
+    Post = apps.get_model('posts', 'Post')
+    PostTag = apps.get_model('posts', 'PostTag')
+    Tag = apps.get_model('posts', 'Tag')
+    last_id = Post.objects.aggregate(last=models.Max('pk'))['last'] or 0
+    for first_id in range(1, last_id + 1, BATCH_SIZE):
+        rows = [
+            (post_id, pub_date, name)
+            for post_id, text, pub_date in Post.objects.filter(
+                pk__range=(first_id, first_id + BATCH_SIZE - 1)
+            ).values_list('id', 'text', 'pub_date').order_by()
+            for name in _extract_tags(text)
+        ]
+        names = list({name for _, _, name in rows})
+        Tag.objects.bulk_create(
+            (Tag(name=name) for name in names), ignore_conflicts=True
+        )
+        ids = {}
+        for start in range(0, len(names), LOOKUP_BATCH_SIZE):
+            ids.update(
+                Tag.objects.filter(
+                    name__in=names[start:start + LOOKUP_BATCH_SIZE]
+                ).values_list('name', 'id')
+            )
+        PostTag.objects.bulk_create(
+            (
+                PostTag(tag_id=ids[name], post_id=post_id, pub_date=pub_date)
+                for post_id, pub_date, name in rows
+            ),
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_post_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Тег')),
+            ],
+            options={
+                'verbose_name': 'Тег',
+                'verbose_name_plural': 'Теги',
+            },
+        ),
+        migrations.CreateModel(
+            name='PostTag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_tags', to='posts.Post', verbose_name='Пост')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_tags', to='posts.Tag', verbose_name='Тег')),
+            ],
+            options={
+                'ordering': ['-pub_date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='posttag',
+            index=models.Index(fields=['tag', '-pub_date', '-post'], name='posttag_tag_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='posttag',
+            index=models.Index(fields=['pub_date'], name='posttag_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='posttag',
+            constraint=models.UniqueConstraint(fields=('tag', 'post'), name='unique_post_tag'),
+        ),
+        migrations.RunPython(fill_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:55
+
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Min, OuterRef, Subquery
+import django.db.models.expressions
+from django.db.models.functions import Coalesce
+
+BATCH_SIZE = 1000
+
+
+def _count(model, field):
+    totals = model.objects.filter(
+        **{field: OuterRef('user_id')}
+    ).order_by().values(field).annotate(total=Count('pk'))
+    return Coalesce(Subquery(totals.values('total')), 0)
+
+
+def remove_duplicates(apps, schema_editor):
+    """Оставляет одну подписку на пару (user, author) и убирает
+    подписки на себя. Пользователи обходятся диапазонами id.
+
+    Лишние подписки раздували follower_count и following_count,
+    поэтому счётчики затронутых пользователей пересчитываются,
+    а свои посты убираются из лент подписанных на себя."""
+    Follow = apps.get_model('posts', 'Follow')
+    Profile = apps.get_model('posts', 'Profile')
+    Timeline = apps.get_model('posts', 'Timeline')
+    self_follows = Follow.objects.filter(user=F('author'))
+    affected = set(self_follows.values_list('user_id', flat=True))
+    self_follows.delete()
+    Timeline.objects.filter(
+        user_id__in=affected, post__author_id=F('user_id')
+    ).delete()
+    last_id = Follow.objects.aggregate(last=Max('user_id'))['last'] or 0
+    for first_id in range(1, last_id + 1, BATCH_SIZE):
+        duplicates = Follow.objects.filter(
+            user_id__gte=first_id,
+            user_id__lte=first_id + BATCH_SIZE - 1,
+        ).values('user_id', 'author_id').annotate(
+            total=Count('id'), keep=Min('id')
+        ).filter(total__gt=1).order_by()
+        for row in duplicates:
+            Follow.objects.filter(
+                user_id=row['user_id'], author_id=row['author_id']
+            ).exclude(id=row['keep']).delete()
+            affected.update((row['user_id'], row['author_id']))
+    affected = sorted(affected)
+    for start in range(0, len(affected), BATCH_SIZE):
+        Profile.objects.filter(
+            user_id__in=affected[start:start + BATCH_SIZE]
+        ).update(
+            follower_count=_count(Follow, 'author'),
+            following_count=_count(Follow, 'user'),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_post_tags'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+        # Уникальный индекс (user, author) заменяет обычный.
+        migrations.RemoveIndex(
+            model_name='follow',
+            name='follow_user_author_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.CheckConstraint(check=models.Q(_negated=True, user=django.db.models.expressions.F('author')), name='no_self_follow'),
+        ),
+    ]
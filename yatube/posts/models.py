@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from core.models import CreatedModel
+from core.storage import ContentAddressedStorage
 
 User = get_user_model()
 
@@ -58,16 +59,82 @@ class Post(CreatedModel):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    comment_count = models.PositiveIntegerField(
+        'Комментариев',
+        default=0,
+        editable=False,
+    )
+    card_version = models.PositiveIntegerField(
+        'Версия карточки',
+        default=0,
+        editable=False,
+    )
+    image_variants = models.TextField(
+        'Варианты картинки',
+        blank=True,
+        editable=False,
+    )
+    # Не width_field/height_field: те читают файл при каждой
+    # загрузке поста из БД, если поля пустые.
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки',
+        null=True,
+        editable=False,
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки',
+        null=True,
+        editable=False,
+    )
+    image_format = models.CharField(
+        'Формат картинки',
+        max_length=10,
+        blank=True,
+        editable=False,
+    )
+    image_size = models.PositiveIntegerField(
+        'Размер картинки, байт',
+        null=True,
+        editable=False,
+    )
+    image_color = models.CharField(
+        'Основной цвет картинки',
+        max_length=7,
+        blank=True,
+        editable=False,
+    )
+    image_placeholder = models.TextField(
+        'Заглушка картинки',
+        blank=True,
+        editable=False,
+    )
 
     def __str__(self) -> str:
         return self.text
 
     class Meta:
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
         verbose_name = 'Создать новую заметку'
         verbose_name_plural = 'Создать новую заметку'
+        indexes = [
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='post_pub_date_idx',
+            ),
+            models.Index(
+                fields=('group', '-pub_date', '-id'),
+                name='post_group_pub_date_idx',
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='post_author_pub_date_idx',
+            ),
+            # Поиск постов с тем же файлом картинки.
+            models.Index(fields=('image',), name='post_image_idx'),
+        ]
 
 
 class Comment(models.Model):
@@ -91,6 +158,14 @@ class Comment(models.Model):
         verbose_name='Дата и время'
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=('post', 'created'),
+                name='comment_post_created_idx',
+            ),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -105,3 +180,138 @@ class Follow(models.Model):
         verbose_name='Автор',
         related_name='following',
     )
+
+    class Meta:
+        constraints = [
+            # Индекс (user, author) для ленты и проверки подписки.
+            models.UniqueConstraint(
+                fields=('user', 'author'),
+                name='unique_follow',
+            ),
+            models.CheckConstraint(
+                check=~models.Q(user=models.F('author')),
+                name='no_self_follow',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=('author', 'user'),
+                name='follow_author_user_idx',
+            ),
+        ]
+
+
+class Profile(models.Model):
+    """Денормализованные счётчики пользователя."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='profile',
+        verbose_name='Пользователь',
+    )
+    post_count = models.PositiveIntegerField('Постов', default=0)
+    follower_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Профиль'
+        verbose_name_plural = 'Профили'
+        indexes = [
+            models.Index(
+                fields=('follower_count',),
+                name='profile_follower_count_idx',
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return str(self.user)
+
+
+class Timeline(models.Model):
+    """Материализованная лента подписок: пост в ленте читателя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Читатель',
+        related_name='timeline',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        verbose_name='Пост',
+        related_name='timelines',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации'
+    )
+
+    class Meta:
+        ordering = ['-pub_date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='unique_timeline_post',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-pub_date', '-post'),
+                name='timeline_user_pub_date_idx',
+            ),
+        ]
+
+
+class Tag(models.Model):
+    """Хештег из текста постов, без «#» и в нижнем регистре."""
+    name = models.CharField(
+        'Тег',
+        max_length=50,
+        unique=True,
+    )
+
+    class Meta:
+        verbose_name = 'Тег'
+        verbose_name_plural = 'Теги'
+
+    def __str__(self) -> str:
+        return f'#{self.name}'
+
+
+class PostTag(models.Model):
+    """Тег поста с датой публикации для ленты тега по индексу."""
+    tag = models.ForeignKey(
+        Tag,
+        on_delete=models.CASCADE,
+        verbose_name='Тег',
+        related_name='post_tags',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        verbose_name='Пост',
+        related_name='post_tags',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации'
+    )
+
+    class Meta:
+        ordering = ['-pub_date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=('tag', 'post'),
+                name='unique_post_tag',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=('tag', '-pub_date', '-post'),
+                name='posttag_tag_pub_date_idx',
+            ),
+            # Окно популярных тегов за последние дни.
+            models.Index(
+                fields=('pub_date',),
+                name='posttag_pub_date_idx',
+            ),
+        ]
@@ -0,0 +1,161 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+WORD_RE = re.compile(r'\w+')
+# unicode61 снимает диакритику только с латиницы, поэтому «ё» в индексе
+# и в запросах заменяется на «е».
+NORMALIZED_TEXT_SQL = "REPLACE(REPLACE(text, 'ё', 'е'), 'Ё', 'Е')"
+# Самые новые совпадения с оценкой bm25 (меньше - релевантнее).
+CANDIDATES_SQL = (
+    f'SELECT rowid, bm25({FTS_TABLE}) AS score FROM {FTS_TABLE} '
+    f'WHERE {FTS_TABLE} MATCH %s ORDER BY rowid DESC LIMIT %s'
+)
+
+# Все совпадения. Условие пишется как id IN (...) через extra(): pk__in
+# с RawSQL даёт IN ((...)), и SQLite берёт лишь первую строку подзапроса.
+MATCH_SQL = f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+
+
+def search_available():
+    """Полнотекстовый индекс есть только в SQLite с FTS5."""
+    return connection.vendor == 'sqlite'
+
+
+def normalize(text):
+    return text.replace('ё', 'е').replace('Ё', 'Е')
+
+
+def index_post(post_id, text):
+    if not search_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE}(rowid, text) VALUES (%s, %s)',
+            [post_id, normalize(text)],
+        )
+
+
+def unindex_post(post_id):
+    if not search_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+
+
+def rebuild_index(batch_size):
+    """Заполняет индекс заново пачками по диапазонам id постов."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute('SELECT MAX(id) FROM posts_post')
+        last_id = cursor.fetchone()[0] or 0
+        for first_id in range(1, last_id + 1, batch_size):
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE}(rowid, text) '
+                f'SELECT id, {NORMALIZED_TEXT_SQL} FROM posts_post '
+                'WHERE id BETWEEN %s AND %s',
+                [first_id, first_id + batch_size - 1],
+            )
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"
+        )
+        cursor.execute(f'SELECT COUNT(*) FROM {FTS_TABLE}')
+        return cursor.fetchone()[0]
+
+
+def match_query(text):
+    """Запрос FTS5 из пользовательского текста.
+
+    Каждое слово берётся в кавычки, чтобы операторы и знаки FTS5 не
+    ломали запрос; последнее слово ищется как префикс.
+    """
+    words = WORD_RE.findall(normalize(text.lower()))
+    words = words[:settings.SEARCH_MAX_WORDS]
+    if not words:
+        return ''
+    terms = ['"%s"' % word for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+class SearchResults:
+    """Посты, найденные по запросу, в порядке релевантности (bm25).
+
+    Ранжируются только SEARCH_CANDIDATES самых новых совпадений:
+    FTS5 отдаёт их по rowid без сортировки всех найденных строк,
+    так что частое слово не заставляет считать bm25 для миллионов
+    постов. Объект понимает count() и срезы, как HybridFeed.
+    """
+
+    def __init__(self, text):
+        self.match = match_query(text)
+
+    def count(self):
+        if not self.match:
+            return 0
+        if not search_available():
+            return self._fallback().count()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM ({CANDIDATES_SQL})',
+                [self.match, settings.SEARCH_CANDIDATES],
+            )
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        if not self.match:
+            return []
+        start = index.start or 0
+        stop = settings.SEARCH_CANDIDATES
+        if index.stop is not None:
+            stop = min(index.stop, stop)
+        if not search_available():
+            return list(self._fallback()[start:stop])
+        ids = self.post_ids(start, stop)
+        posts = Post.objects.select_related('author', 'group').in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+    def post_ids(self, start=0, stop=None):
+        """id найденных постов по убыванию релевантности (только FTS5)."""
+        if not self.match:
+            return []
+        if stop is None:
+            stop = settings.SEARCH_CANDIDATES
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM ({CANDIDATES_SQL}) '
+                'ORDER BY score, rowid DESC LIMIT %s OFFSET %s',
+                [self.match, settings.SEARCH_CANDIDATES,
+                 max(stop - start, 0), start],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def filter_queryset(self, queryset):
+        """Все посты queryset, совпавшие с запросом (только FTS5).
+
+        В отличие от срезов, без отсечки SEARCH_CANDIDATES - для
+        списков, где нужны все совпадения в своём порядке.
+        """
+        if not self.match:
+            return queryset.none()
+        return queryset.extra(
+            where=[f'{queryset.model._meta.db_table}.id IN ({MATCH_SQL})'],
+            params=[self.match],
+        )
+
+    def _fallback(self):
+        """Без FTS5 - поиск подстроки по всем словам, от новых к старым."""
+        posts = Post.objects.select_related('author', 'group')
+        for word in WORD_RE.findall(self.match):
+            posts = posts.filter(text__icontains=word)
+        return posts[:settings.SEARCH_CANDIDATES]
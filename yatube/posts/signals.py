@@ -0,0 +1,169 @@
+from django.db.models import F
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from . import counters, feeds, search, tags
+from .caching import author_generation, bump_generation, group_generation
+from .models import Comment, Follow, Group, Post, Profile, User
+from .thumbnails import update_image_metadata
+from .utils import count_scope, forget_counts
+
+
+def _forget_post_counts(post):
+    """Сбрасывает кэш числа постов в общих лентах, где виден пост.
+
+    Ленты подписчиков автора сбрасывает задача очереди.
+    """
+    scopes = [
+        count_scope('global'),
+        count_scope('author', post.author_id),
+    ]
+    if post.group_id:
+        scopes.append(count_scope('group', post.group_id))
+    forget_counts(*scopes)
+
+
+def _bump_post_pages(post, group_ids):
+    """Сдвигает поколения index, страницы автора и групп поста."""
+    slugs = Group.objects.filter(
+        pk__in=[pk for pk in group_ids if pk]
+    ).values_list('slug', flat=True)
+    bump_generation(
+        'posts',
+        author_generation(post.author_id),
+        *map(group_generation, slugs)
+    )
+
+
+# Поля пользователя, которые видны в карточке поста.
+CARD_USER_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, update_fields=None,
+               **kwargs):
+    if raw:
+        return
+    if created:
+        Profile.objects.get_or_create(user=instance)
+    elif update_fields is None or CARD_USER_FIELDS & set(update_fields):
+        Post.objects.filter(author=instance).update(
+            card_version=F('card_version') + 1
+        )
+        bump_generation('users')
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    bump_generation('users')
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_generation('groups')
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, raw=False, **kwargs):
+    instance._old_group_id = None
+    if raw:
+        return
+    old_image = None
+    if not instance._state.adding:
+        instance.card_version += 1
+        old = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group_id', 'image').first()
+        if old is not None:
+            instance._old_group_id, old_image = old
+    update_image_metadata(instance, old_image)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, update_fields=None,
+               **kwargs):
+    if raw:
+        return
+    if created or update_fields is None or 'text' in update_fields:
+        search.index_post(instance.pk, instance.text)
+        forget_counts(*(
+            count_scope('tag', pk) for pk in tags.sync_post_tags(instance)
+        ))
+    old_group_id = getattr(instance, '_old_group_id', None)
+    _bump_post_pages(instance, {instance.group_id, old_group_id})
+    if old_group_id != instance.group_id and not created:
+        forget_counts(*(
+            count_scope('group', pk)
+            for pk in (old_group_id, instance.group_id) if pk
+        ))
+    if created:
+        counters.bump(instance.author_id, post_count=1)
+        feeds.fan_out_post(instance)
+        _forget_post_counts(instance)
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    # Теги поста удаляются каскадом раньше, чем придёт post_delete.
+    instance._tag_ids = tags.post_tag_ids(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    search.unindex_post(instance.pk)
+    forget_counts(*(
+        count_scope('tag', pk) for pk in getattr(instance, '_tag_ids', ())
+    ))
+    _bump_post_pages(instance, {instance.group_id})
+    counters.bump(instance.author_id, post_count=-1)
+    feeds.forget_recent_posts(instance.author_id)
+    _forget_post_counts(instance)
+    feeds.forget_follow_counts.delay(
+        instance.author_id,
+        dedupe_key=f'follow-counts:{instance.author_id}',
+    )
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump(instance.author_id, follower_count=1)
+        counters.bump(instance.user_id, following_count=1)
+        feeds.add_author(instance.user_id, instance.author_id)
+        forget_counts(count_scope('follow', instance.user_id))
+        # Профиль читателя показывает число его подписок.
+        bump_generation(
+            author_generation(instance.author_id),
+            author_generation(instance.user_id),
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.bump(instance.author_id, follower_count=-1)
+    counters.bump(instance.user_id, following_count=-1)
+    feeds.remove_author(instance.user_id, instance.author_id)
+    forget_counts(count_scope('follow', instance.user_id))
+    feeds.leave_pull(instance.author_id)
+    bump_generation(
+        author_generation(instance.author_id),
+        author_generation(instance.user_id),
+    )
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.bump_comments(instance.post_id, -1)
@@ -0,0 +1,95 @@
+from contextlib import contextmanager
+from itertools import cycle
+
+from django.db import connection, transaction
+
+from .feeds import rebuild_timeline
+from .models import Comment, Follow, Group, Post, User
+
+PREFIX = 'synthetic'
+
+
+class _Rollback(Exception):
+    pass
+
+
+@contextmanager
+def synthetic_dataset(posts, users=1000, groups=50, readers=10,
+                      follows=100, comments=1000, batch_size=None):
+    """Наполняет базу синтетическими данными и откатывает их на выходе.
+
+    Отдаёт словарь с примерами объектов для построения запросов:
+    group, author, reader, post.
+    """
+    try:
+        with transaction.atomic():
+            yield _populate(
+                posts, users, groups, readers, follows, comments, batch_size
+            )
+            raise _Rollback
+    except _Rollback:
+        pass
+
+
+def _populate(posts, users, groups, readers, follows, comments, batch_size):
+    User.objects.bulk_create(
+        (User(username=f'{PREFIX}_{i}') for i in range(users)),
+        batch_size=batch_size,
+    )
+    Group.objects.bulk_create(
+        (
+            Group(title=f'{PREFIX} {i}', slug=f'{PREFIX}-{i}')
+            for i in range(groups)
+        ),
+        batch_size=batch_size,
+    )
+    user_ids = list(
+        User.objects.filter(
+            username__startswith=PREFIX
+        ).values_list('id', flat=True)
+    )
+    group_ids = list(
+        Group.objects.filter(
+            slug__startswith=PREFIX
+        ).values_list('id', flat=True)
+    )
+    Post.objects.bulk_create(
+        (
+            Post(
+                text=f'{PREFIX} post {i}',
+                author_id=user_ids[i % len(user_ids)],
+                group_id=group_ids[i % len(group_ids)] if i % 3 else None,
+            )
+            for i in range(posts)
+        ),
+        batch_size=batch_size,
+    )
+    reader_ids = user_ids[:readers]
+    Follow.objects.bulk_create(
+        (
+            Follow(user_id=reader_id, author_id=author_id)
+            for reader_id in reader_ids
+            for author_id in user_ids[readers:readers + follows]
+        ),
+        batch_size=batch_size,
+    )
+    for reader_id in reader_ids:
+        rebuild_timeline(reader_id)
+    post = Post.objects.filter(author_id=user_ids[-1]).first()
+    Comment.objects.bulk_create(
+        (
+            Comment(text=f'{PREFIX} comment {i}', author_id=reader_id,
+                    post=post)
+            for i, reader_id in zip(range(comments), cycle(reader_ids))
+        ),
+        batch_size=batch_size,
+    )
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+    return {
+        'group': Group.objects.get(id=group_ids[0]),
+        'author': User.objects.get(id=user_ids[readers]),
+        'reader': User.objects.get(id=reader_ids[0]),
+        'post': post,
+    }
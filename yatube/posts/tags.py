@@ -0,0 +1,151 @@
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Max
+from django.utils import timezone
+
+from .models import Post, PostTag, Tag
+from .search import normalize
+
+# «#» не после буквы, «&» (сущности HTML) и «/» (якоря в ссылках).
+TAG_RE = re.compile(r'(?<![\w&/#])#(\w+)')
+TRENDING_KEY = 'tags:trending'
+# Сколько имён искать одним запросом: SQLite ограничивает число
+# параметров запроса.
+LOOKUP_BATCH_SIZE = 500
+
+
+def tag_name(word):
+    """Имя тега для поиска и хранения: нижний регистр, «ё» как «е»."""
+    return normalize(word.lower())
+
+
+def extract_tags(text):
+    """Имена хештегов текста в порядке появления, без повторов.
+
+    Числа вроде «#1» тегами не считаются, слишком длинные теги
+    и теги сверх TAG_MAX_PER_POST отбрасываются.
+    """
+    max_length = Tag._meta.get_field('name').max_length
+    names = []
+    for word in TAG_RE.findall(text):
+        name = tag_name(word)
+        if name.isdigit() or len(name) > max_length or name in names:
+            continue
+        names.append(name)
+        if len(names) == settings.TAG_MAX_PER_POST:
+            break
+    return names
+
+
+def _tag_ids(names):
+    """{имя: id} тегов, недостающие теги создаются."""
+    names = list(names)
+    Tag.objects.bulk_create(
+        (Tag(name=name) for name in names), ignore_conflicts=True
+    )
+    ids = {}
+    for start in range(0, len(names), LOOKUP_BATCH_SIZE):
+        ids.update(
+            Tag.objects.filter(
+                name__in=names[start:start + LOOKUP_BATCH_SIZE]
+            ).values_list('name', 'id')
+        )
+    return ids
+
+
+def sync_post_tags(post):
+    """Приводит теги поста в соответствие с текстом.
+
+    Возвращает id тегов, у которых изменился список постов.
+    """
+    names = extract_tags(post.text)
+    current = dict(
+        PostTag.objects.filter(post=post).values_list('tag__name', 'tag_id')
+    )
+    stale = [pk for name, pk in current.items() if name not in names]
+    if stale:
+        PostTag.objects.filter(post=post, tag_id__in=stale).delete()
+    added = _tag_ids(name for name in names if name not in current)
+    PostTag.objects.bulk_create(
+        (
+            PostTag(tag_id=pk, post=post, pub_date=post.pub_date)
+            for pk in added.values()
+        ),
+        ignore_conflicts=True,
+    )
+    return set(stale) | set(added.values())
+
+
+def post_tag_ids(post_id):
+    return list(
+        PostTag.objects.filter(post_id=post_id).values_list(
+            'tag_id', flat=True
+        )
+    )
+
+
+def rebuild_tags(batch_size):
+    """Заполняет теги постов заново пачками по диапазонам id."""
+    with transaction.atomic():
+        PostTag.objects.all().delete()
+        last_id = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+        linked = 0
+        for first_id in range(1, last_id + 1, batch_size):
+            rows = [
+                (post_id, pub_date, name)
+                for post_id, text, pub_date in Post.objects.filter(
+                    pk__range=(first_id, first_id + batch_size - 1)
+                ).values_list('id', 'text', 'pub_date').order_by()
+                for name in extract_tags(text)
+            ]
+            ids = _tag_ids({name for _, _, name in rows})
+            PostTag.objects.bulk_create(
+                PostTag(tag_id=ids[name], post_id=post_id, pub_date=pub_date)
+                for post_id, pub_date, name in rows
+            )
+            linked += len(rows)
+        return linked
+
+
+def tag_feed(tag):
+    """Посты с тегом: один проход по индексу (tag, pub_date) PostTag."""
+    return Post.objects.select_related(
+        'author',
+        'group',
+    ).filter(
+        post_tags__tag=tag
+    ).order_by(
+        '-post_tags__pub_date',
+        # F() обходит подстановку Post.Meta.ordering для внешнего ключа.
+        F('post_tags__post_id').desc(),
+    )
+
+
+def trending_tags():
+    """Самые частые теги за TAG_TRENDING_WINDOW: [(имя, число постов)].
+
+    Список считается по индексу pub_date и лежит в кэше
+    TAG_TRENDING_CACHE_TIME, а не пересчитывается на каждый пост.
+    """
+    def compute():
+        since = timezone.now() - timedelta(
+            seconds=settings.TAG_TRENDING_WINDOW
+        )
+        return list(
+            PostTag.objects.filter(
+                pub_date__gte=since
+            ).values_list(
+                'tag__name'
+            ).annotate(
+                recent=Count('id')
+            ).order_by(
+                '-recent', 'tag__name'
+            )[:settings.TAG_TRENDING_LIMIT]
+        )
+    return cache.get_or_set(
+        TRENDING_KEY, compute, settings.TAG_TRENDING_CACHE_TIME
+    )
@@ -0,0 +1,20 @@
+from django import template
+
+register = template.Library()
+
+PAGE_PARAMS = ('page', 'after', 'before')
+
+
+@register.simple_tag(takes_context=True)
+def page_query(context, **params):
+    """Строка запроса ссылки пагинатора.
+
+    Сохраняет параметры текущей страницы (например, q поиска) и
+    заменяет параметры пагинации на переданные.
+    """
+    query = context['request'].GET.copy()
+    for name in PAGE_PARAMS:
+        query.pop(name, None)
+    for name, value in params.items():
+        query[name] = value
+    return query.urlencode()
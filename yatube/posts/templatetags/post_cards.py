@@ -0,0 +1,38 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+# Префикс меняется вместе с разметкой карточки, чтобы после выкладки
+# не отдавались карточки, отрендеренные старым шаблоном.
+CARD_KEY = 'post_card:2:{}:{}'
+CARD_TEMPLATE = 'posts/post_list.html'
+
+
+def card_key(post):
+    return CARD_KEY.format(post.pk, post.card_version)
+
+
+@register.simple_tag(takes_context=True)
+def prefetch_post_cards(context, posts):
+    """Достаёт из кэша карточки всей страницы одним запросом."""
+    context.render_context['post_cards'] = cache.get_many(
+        [card_key(post) for post in posts]
+    )
+    return ''
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post):
+    """Карточка поста из кэша; рендерится только при промахе."""
+    key = card_key(post)
+    html = context.render_context.get('post_cards', {}).get(key)
+    if html is None:
+        html = cache.get(key)
+    if html is None:
+        html = render_to_string(CARD_TEMPLATE, {'post': post})
+        cache.set(key, html, settings.POST_CARD_CACHE_TIME)
+    return mark_safe(html)
@@ -0,0 +1,73 @@
+from django import template
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from posts.thumbnails import mime_type, read_variants
+
+register = template.Library()
+
+
+def _srcset(storage, variants):
+    return ', '.join(
+        f'{storage.url(name)} {width}w' for width, _, name in variants
+    )
+
+
+def _placeholder_style(post):
+    """Фон <img> до загрузки: размытая заглушка поверх основного цвета."""
+    color = post.image_color or 'transparent'
+    if post.image_placeholder:
+        return (
+            f'background: {color} url({post.image_placeholder}) '
+            'center / cover no-repeat'
+        )
+    if post.image_color:
+        return f'background-color: {color}'
+    return ''
+
+
+@register.inclusion_tag('posts/includes/post_image.html')
+def post_image(post, lazy=False):
+    """Картинка поста со srcset по манифесту вариантов.
+
+    Адреса собираются из манифеста без обращения к файлам и хранилищу
+    ключей sorl. Пока вариантов нет или в манифесте нет ни одного
+    формата из POST_IMAGE_FORMATS, выводится обычная миниатюра.
+    Форматы с неизвестным MIME-типом в <source> не попадают.
+    С lazy картинка грузится браузером, только когда подходит к
+    экрану, а до того место под неё держат width/height и заглушка.
+    """
+    context = {
+        'post': post,
+        'image': None,
+        'lazy': lazy,
+        'style': _placeholder_style(post),
+    }
+    manifest = read_variants(post)
+    if manifest is None:
+        return context
+    storage = default_storage
+    variants = manifest['variants']
+    formats = [
+        fmt for fmt in settings.POST_IMAGE_FORMATS if variants.get(fmt)
+    ]
+    if not formats:
+        return context
+    *alternatives, fallback = formats
+    largest = variants[fallback][-1]
+    sources = []
+    for fmt in alternatives:
+        mime = mime_type(fmt)
+        if mime:
+            sources.append(
+                {'type': mime, 'srcset': _srcset(storage, variants[fmt])}
+            )
+    context['image'] = {
+        'sources': sources,
+        'src': storage.url(largest[2]),
+        'srcset': _srcset(storage, variants[fallback]),
+        'sizes': settings.POST_IMAGE_SIZES,
+        'width': largest[0],
+        'height': largest[1],
+    }
+    return context
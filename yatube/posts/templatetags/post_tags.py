@@ -0,0 +1,32 @@
+from django import template
+from django.urls import reverse
+from django.utils.html import conditional_escape, format_html
+from django.utils.safestring import mark_safe
+
+from posts.tags import TAG_RE, extract_tags, tag_name, trending_tags
+
+register = template.Library()
+
+
+@register.filter(needs_autoescape=True)
+def link_tags(text, autoescape=True):
+    """Текст поста, в котором хештеги стали ссылками на ленты тегов."""
+    if autoescape:
+        text = conditional_escape(text)
+    names = set(extract_tags(text))
+
+    def link(match):
+        name = tag_name(match.group(1))
+        if name not in names:
+            return match.group(0)
+        return format_html(
+            '<a href="{}">{}</a>',
+            reverse('posts:tag_posts', args=[name]),
+            mark_safe(match.group(0)),
+        )
+    return mark_safe(TAG_RE.sub(link, text))
+
+
+@register.inclusion_tag('posts/includes/trending_tags.html')
+def show_trending_tags():
+    return {'tags': trending_tags()}
@@ -0,0 +1,100 @@
+import datetime
+
+from django.contrib import admin
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from posts.models import Group, Post, User
+
+# Считаются только запросы changelist, без обращений к кэшу в БД.
+LOCMEM_CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+}}
+
+
+class PostAdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        cls.groups = Group.objects.bulk_create(
+            Group(title=f'Группа {i}', slug=f'group-{i}') for i in range(3)
+        )
+        cls.group = Group.objects.get(slug='group-1')
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост номер {i}',
+                author=cls.admin,
+                group=cls.group if i % 2 else None,
+            )
+            for i in range(5)
+        ]
+        Post.objects.filter(pk=cls.posts[0].pk).update(
+            pub_date=timezone.now() - datetime.timedelta(days=400)
+        )
+        cls.model_admin = admin.site._registry[Post]
+
+    def setUp(self):
+        cache.clear()
+
+    def changelist(self, **params):
+        request = RequestFactory().get('/admin/posts/post/', params)
+        request.user = self.admin
+        return self.model_admin.changelist_view(request).render()
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        '''Авторы, группы и варианты групп не запрашиваются на каждую строку'''
+        self.changelist()
+        with self.assertNumQueries(8):
+            response = self.changelist()
+        self.assertContains(response, 'Пост номер 4')
+        Post.objects.bulk_create(
+            Post(text=f'Ещё пост {i}', author=self.admin, group=self.group)
+            for i in range(20)
+        )
+        with self.assertNumQueries(8):
+            self.changelist()
+
+    def test_group_select_marks_current_group(self):
+        '''Select групп в строке показывает группу поста'''
+        response = self.changelist()
+        self.assertContains(
+            response,
+            f'<option value="{self.group.pk}" selected>{self.group}</option>',
+            count=2,
+        )
+
+    def test_date_hierarchy_uses_index_jumps(self):
+        '''date_hierarchy находит годы поста отдельными MIN по pub_date'''
+        queryset = self.model_admin.get_queryset(None)
+        for kind in ('year', 'month', 'day'):
+            with self.subTest(kind=kind):
+                self.assertEqual(
+                    queryset.dates('pub_date', kind, order='DESC'),
+                    list(Post.objects.dates('pub_date', kind, order='DESC')),
+                )
+        years = queryset.dates('pub_date', 'year')
+        self.assertEqual(len(years), 2)
+        response = self.changelist()
+        for year in years:
+            self.assertContains(response, f'pub_date__year={year.year}')
+
+    def test_search_uses_full_text_index(self):
+        '''Поиск в админке идёт по индексу FTS5 и пустой результат не падает'''
+        response = self.changelist(q='номер 3')
+        self.assertEqual(
+            list(response.context_data['cl'].result_list), [self.posts[3]]
+        )
+        response = self.changelist(q='нигде')
+        self.assertEqual(list(response.context_data['cl'].result_list), [])
+
+    @override_settings(SEARCH_CANDIDATES=2)
+    def test_search_is_not_capped(self):
+        '''Поиск в админке отдаёт все совпадения, а не SEARCH_CANDIDATES'''
+        response = self.changelist(q='номер')
+        self.assertEqual(response.context_data['cl'].result_count, 5)
+        response = self.changelist(q='!!!')
+        self.assertEqual(response.context_data['cl'].result_count, 0)
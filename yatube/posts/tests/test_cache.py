@@ -3,7 +3,8 @@ import shutil
 from django.urls import reverse
 from django.test import Client, TestCase, override_settings
 from django.conf import settings
-from posts.models import Post, User, Group
+from posts.caching import author_generation, profile_page_generations
+from posts.models import Follow, Post, User, Group
 from django.core.cache import cache
 
 
@@ -46,9 +47,109 @@ class CacheIndexTest(TestCase):
         '''Проверка кэша для index.'''
 
         response = self.authorized_author.get(reverse('posts:index'))
-        Post.objects.last().delete()
+        Post.objects.update(text='Изменено в обход сигналов')
         response_2 = self.authorized_author.get(reverse('posts:index'))
         self.assertEqual(response.content, response_2.content)
         cache.clear()
         response_3 = self.authorized_author.get(reverse('posts:index'))
         self.assertNotEqual(response_2.content, response_3.content)
+
+    def test_cache_index_invalidated_by_writes(self):
+        '''Запись поста, группы или автора сразу обновляет index.'''
+
+        url = reverse('posts:index')
+        response = self.authorized_author.get(url)
+        Post.objects.last().delete()
+        response_2 = self.authorized_author.get(url)
+        self.assertNotEqual(response.content, response_2.content)
+        Post.objects.create(text='Новый пост', author=self.user)
+        self.assertContains(self.authorized_author.get(url), 'Новый пост')
+        self.user.first_name = 'Переименованный'
+        self.user.save()
+        self.assertContains(
+            self.authorized_author.get(url), 'Переименованный'
+        )
+
+    def test_cache_index_varies_on_user(self):
+        '''Гость не получает страницу, закэшированную для автора.'''
+
+        self.authorized_author.get(reverse('posts:index'))
+        response = Client().get(reverse('posts:index'))
+        self.assertNotContains(response, 'Выйти')
+
+
+class CacheGroupProfileTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title='Первая группа', slug='first', description='Описание'
+        )
+        cls.other = Group.objects.create(
+            title='Вторая группа', slug='second', description='Описание'
+        )
+        cls.user = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            text='Пост в группе', group=self.group, author=self.user
+        )
+        self.first_url = reverse('posts:group_list', args=['first'])
+        self.second_url = reverse('posts:group_list', args=['second'])
+        self.profile_url = reverse('posts:profile', args=['author'])
+
+    def test_unrelated_pages_stay_cached(self):
+        '''Страницы групп и профиля кэшируются.'''
+
+        for url in (self.first_url, self.profile_url):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                Post.objects.update(text='Изменено в обход сигналов')
+                self.assertEqual(
+                    response.content, self.client.get(url).content
+                )
+                Post.objects.update(text='Пост в группе')
+
+    def test_moved_post_invalidates_both_groups(self):
+        '''Перенос поста сбрасывает кэш старой и новой группы.'''
+
+        self.client.get(self.first_url)
+        self.client.get(self.second_url)
+        self.post.group = self.other
+        self.post.save()
+        self.assertNotContains(self.client.get(self.first_url), 'Пост в')
+        self.assertContains(self.client.get(self.second_url), 'Пост в')
+        self.assertContains(self.client.get(self.profile_url), 'Пост в')
+
+    def test_profile_generation_keyed_by_id(self):
+        '''Поколение страницы профиля зависит от id автора, а не имени.'''
+
+        self.assertEqual(
+            profile_page_generations('author')[0],
+            author_generation(self.user.pk),
+        )
+        self.user.username = 'Автор с пробелом'
+        self.user.save()
+        self.assertEqual(self.client.get(self.profile_url).status_code, 404)
+
+    def test_follow_invalidates_follower_profile(self):
+        '''Подписка обновляет число подписок в профиле читателя.'''
+
+        url = reverse('posts:profile', args=['reader'])
+        self.assertContains(self.client.get(url), 'подписок: 0')
+        follow = Follow.objects.create(user=self.reader, author=self.user)
+        self.assertContains(self.client.get(url), 'подписок: 1')
+        follow.delete()
+        self.assertContains(self.client.get(url), 'подписок: 0')
+
+    def test_profile_follow_button_per_viewer(self):
+        '''Кнопка подписки зависит от пользователя и подписки.'''
+
+        reader = Client()
+        reader.force_login(self.reader)
+        self.assertContains(reader.get(self.profile_url), 'Подписаться')
+        Follow.objects.create(user=self.reader, author=self.user)
+        self.assertContains(reader.get(self.profile_url), 'Отписаться')
+        self.assertContains(Client().get(self.profile_url), 'Подписаться')
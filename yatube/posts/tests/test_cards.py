@@ -0,0 +1,66 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+from posts.templatetags.post_cards import card_key
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='card_author')
+        cls.group = Group.objects.create(
+            title='Группа карточек',
+            slug='cards',
+            description='Описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            text='Текст карточки', author=self.user, group=self.group
+        )
+
+    def test_feeds_use_cached_card(self):
+        '''Ленты собираются из закэшированных карточек.'''
+
+        cache.set(card_key(self.post), '<p>из кэша</p>')
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.user.username]),
+        )
+        for page in pages:
+            with self.subTest(page=page):
+                self.assertContains(self.client.get(page), 'из кэша')
+
+    def test_card_keeps_line_breaks(self):
+        '''Переносы строк поста сохраняются в карточке вместе с тегами.'''
+
+        Post.objects.create(text='Первая строка\n#вторая', author=self.user)
+        response = self.client.get(
+            reverse('posts:profile', args=[self.user.username])
+        )
+        self.assertContains(response, 'Первая строка<br>')
+        self.assertContains(response, '#вторая</a>')
+
+    def test_card_version_bumps(self):
+        '''Правка поста и смена имени автора меняют ключ карточки.'''
+
+        key = card_key(self.post)
+        self.post.text = 'Новый текст'
+        self.post.save()
+        self.assertNotEqual(card_key(self.post), key)
+
+        key = card_key(self.post)
+        self.user.last_login = self.post.pub_date
+        self.user.save(update_fields=['last_login'])
+        self.post.refresh_from_db()
+        self.assertEqual(card_key(self.post), key)
+
+        self.user.first_name = 'Новое имя'
+        self.user.save()
+        self.post.refresh_from_db()
+        self.assertNotEqual(card_key(self.post), key)
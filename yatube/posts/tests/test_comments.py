@@ -1,4 +1,4 @@
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
 from posts.models import Comment, Group, Post, User
@@ -66,3 +66,82 @@ class CommentTests(TestCase):
         num_comments = Comment.objects.count()
         self.guest.post(self.comment_view_url)
         self.assertEqual(num_comments, Comment.objects.count())
+
+
+@override_settings(COMMENTS_PER_PAGE=5)
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.post = Post.objects.create(
+            text='Популярный пост',
+            author=User.objects.create_user(username='author'),
+        )
+        Comment.objects.bulk_create(
+            Comment(
+                text=f'Комментарий {i}',
+                post=cls.post,
+                author=User.objects.create_user(username=f'reader{i}'),
+            )
+            for i in range(8)
+        )
+
+    def test_post_detail_shows_first_batch(self):
+        '''На странице поста только первая порция комментариев.'''
+
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.id])
+        )
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.text for comment in comments],
+            [f'Комментарий {i}' for i in range(5)]
+        )
+        self.assertContains(response, 'Показать ещё')
+
+    def test_next_batch_fragment(self):
+        '''Следующая порция приходит фрагментом без N+1 по авторам.'''
+
+        first = self.client.get(
+            reverse('posts:post_detail', args=[self.post.id])
+        ).context['comments']
+        url = reverse('posts:comment_list', args=[self.post.id])
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                url,
+                {'after': first.next_cursor},
+                HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+            )
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            [f'Комментарий {i}' for i in range(5, 8)]
+        )
+        self.assertNotContains(response, 'Показать ещё')
+
+    def test_next_batch_without_script(self):
+        '''Без скрипта следующая порция открывается на странице поста.'''
+
+        self.client.force_login(self.post.author)
+        first = self.client.get(
+            reverse('posts:post_detail', args=[self.post.id])
+        ).context['comments']
+        response = self.client.get(
+            reverse('posts:comment_list', args=[self.post.id]),
+            {'after': first.next_cursor},
+            follow=True,
+        )
+        self.assertTemplateUsed(response, 'base.html')
+        self.assertContains(response, 'Добавить комментарий')
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            [f'Комментарий {i}' for i in range(5, 8)]
+        )
+
+    def test_fragment_for_missing_post(self):
+        '''Фрагмент для несуществующего поста отдаёт 404.'''
+
+        response = self.client.get(
+            reverse('posts:comment_list', args=[self.post.id + 1])
+        )
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,75 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Post, Profile, User
+
+
+class CounterTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+
+    def counts(self, user):
+        return Profile.objects.values_list(
+            'post_count', 'follower_count', 'following_count'
+        ).get(user=user)
+
+    def test_counters_follow_writes(self):
+        '''Счётчики меняются вместе с постами, подписками и комментариями.'''
+
+        post = Post.objects.create(text='Пост', author=self.author)
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        comment = Comment.objects.create(
+            text='Комментарий', author=self.user, post=post
+        )
+        self.assertEqual(self.counts(self.author), (1, 1, 0))
+        self.assertEqual(self.counts(self.user), (0, 0, 1))
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+        self.assertEqual(self.counts(self.author), (1, 0, 0))
+        self.assertEqual(self.counts(self.user), (0, 0, 0))
+        post.delete()
+        self.assertEqual(self.counts(self.author), (0, 0, 0))
+
+    def test_counters_on_pages(self):
+        '''Страницы профиля и поста показывают счётчики.'''
+
+        post = Post.objects.create(text='Пост', author=self.author)
+        Follow.objects.create(user=self.user, author=self.author)
+        response = self.client.get(
+            reverse('posts:profile', args=[self.author.username])
+        )
+        self.assertContains(response, 'Подписчиков: 1')
+        response = self.client.get(
+            reverse('posts:post_detail', args=[post.id])
+        )
+        self.assertContains(response, 'Комментариев:  <span >0</span>')
+
+    def test_recount_counters_fixes_drift(self):
+        '''recount_counters восстанавливает разъехавшиеся счётчики.'''
+
+        post = Post.objects.create(text='Пост', author=self.author)
+        Comment.objects.create(text='Комментарий', author=self.user, post=post)
+        Follow.objects.create(user=self.user, author=self.author)
+        Profile.objects.update(
+            post_count=7, follower_count=7, following_count=7
+        )
+        Profile.objects.filter(user=self.user).delete()
+        Post.objects.update(comment_count=7)
+        call_command('recount_counters', batch_size=1, stdout=StringIO())
+        self.assertEqual(self.counts(self.author), (1, 1, 0))
+        self.assertEqual(self.counts(self.user), (0, 0, 1))
+        self.assertEqual(
+            Post.objects.values_list('comment_count', flat=True).get(),
+            1
+        )
@@ -0,0 +1,113 @@
+import csv
+import datetime
+import io
+import json
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.old = Post.objects.create(
+            text='Старый пост', author=cls.author, group=cls.group
+        )
+        Post.objects.filter(pk=cls.old.pk).update(
+            pub_date=timezone.now() - datetime.timedelta(days=30)
+        )
+        cls.new = Post.objects.create(text='Новый пост', author=cls.reader)
+        Comment.objects.create(
+            post=cls.old, author=cls.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def export(self, kind, **params):
+        client = Client()
+        client.force_login(self.staff)
+        return client.get(reverse('posts:export', args=[kind]), params)
+
+    @staticmethod
+    def body(response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_export_is_staff_only(self):
+        '''Выгрузка доступна только сотрудникам'''
+        client = Client()
+        client.force_login(self.reader)
+        response = client.get(reverse('posts:export', args=['posts']))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/admin/login/', response.url)
+
+    def test_export_posts_jsonl_with_filters(self):
+        '''Посты выгружаются потоком JSONL с фильтрами автора и дат'''
+        response = self.export('posts')
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            response['Content-Type'], 'application/x-ndjson; charset=utf-8'
+        )
+        rows = [json.loads(line) for line in self.body(response).split('\n')
+                if line]
+        self.assertEqual(
+            [row['id'] for row in rows], [self.old.pk, self.new.pk]
+        )
+        self.assertEqual(rows[0]['author'], 'author')
+        self.assertEqual(rows[0]['group'], 'group')
+        since = (timezone.now() - datetime.timedelta(days=1)).date()
+        for params, expected in (
+            ({'author': 'author'}, [self.old.pk]),
+            ({'group': 'group'}, [self.old.pk]),
+            ({'since': since.isoformat()}, [self.new.pk]),
+            ({'until': since.isoformat()}, [self.old.pk]),
+        ):
+            with self.subTest(params=params):
+                body = self.body(self.export('posts', **params))
+                self.assertEqual(
+                    [json.loads(line)['id'] for line in body.splitlines()],
+                    expected,
+                )
+
+    def test_export_comments_and_follows_csv(self):
+        '''Комментарии и подписки выгружаются в CSV с заголовком'''
+        rows = list(csv.reader(io.StringIO(
+            self.body(self.export('comments', format='csv', group='group'))
+        )))
+        self.assertEqual(rows[0], ['id', 'post', 'author', 'text', 'created'])
+        self.assertEqual(rows[1][1:4], [str(self.old.pk), 'reader',
+                                        'Комментарий'])
+        rows = list(csv.reader(io.StringIO(
+            self.body(self.export('follows', format='csv'))
+        )))
+        self.assertEqual(rows[1][1:], ['reader', 'author'])
+
+    def test_export_rejects_bad_parameters(self):
+        '''Неверные формат, дата или фильтр дают 400, неизвестный вид - 404'''
+        self.assertEqual(self.export('users').status_code, 404)
+        for kind, params in (
+            ('posts', {'format': 'xml'}),
+            ('posts', {'since': 'вчера'}),
+            ('follows', {'group': 'group'}),
+        ):
+            with self.subTest(kind=kind, params=params):
+                self.assertEqual(self.export(kind, **params).status_code, 400)
+
+    def test_export_command_output_can_be_imported(self):
+        '''Команда export_data пишет посты в формате import_posts'''
+        out = io.StringIO()
+        call_command('export_data', 'posts', author='reader', stdout=out)
+        row = json.loads(out.getvalue())
+        self.assertEqual(row['text'], 'Новый пост')
+        self.assertEqual(row['author'], 'reader')
+        with self.assertRaises(CommandError):
+            call_command('export_data', 'follows', since='2020-01-01')
@@ -1,6 +1,16 @@
+from io import StringIO
+from django.core.management import call_command
 from django.urls import reverse
-from django.test import TestCase
-from posts.models import User, Follow
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.db import IntegrityError, connection, transaction
+from django.test.utils import CaptureQueriesContext
+from core.models import Task
+from core.tasks import run_pending
+from posts.feeds import HybridFeed, follow_feed
+from posts.follows import follow, follow_many, unfollow
+from posts.models import User, Follow, Post, Profile, Timeline
+from posts.utils import CURSOR, CursorPaginator
 from http import HTTPStatus
 
 
@@ -36,3 +46,214 @@ class FollowTests(TestCase):
         self.assertFalse(Follow.objects.filter(
             user=self.user, author=self.author).exists())
         self.assertEqual(follow_count - 1, Follow.objects.count())
+
+
+@override_settings(TASKS_EAGER=True)
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.old_post = Post.objects.create(
+            text='Старый пост', author=cls.author
+        )
+
+    def test_timeline_follows_subscriptions(self):
+        '''Лента пополняется при подписке, новом посте и отписке.'''
+
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(
+            list(follow_feed(self.user)), [self.old_post]
+        )
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertEqual(
+            list(follow_feed(self.user)), [new_post, self.old_post]
+        )
+        follow.delete()
+        self.assertFalse(Timeline.objects.filter(user=self.user).exists())
+
+    @override_settings(TASKS_EAGER=False)
+    def test_fan_out_goes_through_task_queue(self):
+        '''Новый пост раскладывается по лентам задачей очереди.'''
+
+        Follow.objects.create(user=self.user, author=self.author)
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        task = Task.objects.get(name='posts.fan_out_post')
+        self.assertEqual(task.dedupe_key, f'fan-out:{new_post.pk}')
+        self.assertEqual(list(follow_feed(self.user)), [self.old_post])
+        run_pending()
+        self.assertEqual(
+            list(follow_feed(self.user)), [new_post, self.old_post]
+        )
+
+    def test_backfill_rebuilds_drifted_timeline(self):
+        '''backfill_timelines восстанавливает разъехавшуюся ленту.'''
+
+        Follow.objects.create(user=self.user, author=self.author)
+        Timeline.objects.filter(user=self.user).delete()
+        call_command(
+            'backfill_timelines', user=['reader'], stdout=StringIO()
+        )
+        self.assertEqual(
+            list(follow_feed(self.user)), [self.old_post]
+        )
+
+
+@override_settings(FEED_PULL_THRESHOLD=1, TASKS_EAGER=True)
+class HybridFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.fan = User.objects.create_user(username='fan')
+        cls.star = User.objects.create_user(username='star')
+        cls.author = User.objects.create_user(username='writer')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+        for user in (self.reader, self.fan):
+            Follow.objects.create(user=user, author=self.star)
+        Follow.objects.create(user=self.reader, author=self.author)
+        cache.clear()
+        self.posts = [
+            Post.objects.create(text=f'Пост {i}', author=author)
+            for i, author in enumerate(
+                (self.star, self.author, self.star, self.author)
+            )
+        ]
+
+    def test_star_posts_are_pulled(self):
+        '''Посты популярного автора подмешиваются при чтении.'''
+
+        self.assertFalse(
+            Timeline.objects.filter(post__author=self.star).exists()
+        )
+        feed = follow_feed(self.reader)
+        self.assertIsInstance(feed, HybridFeed)
+        self.assertEqual(feed.count(), 4)
+        self.assertEqual(list(feed[0:4]), self.posts[::-1])
+        self.assertEqual(list(feed[1:3]), self.posts[2:0:-1])
+
+    def test_follow_index_merges_feeds(self):
+        '''follow_index отдаёт объединённую ленту в обоих режимах.'''
+
+        expected = self.posts[::-1]
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), expected)
+        with self.settings(PAGINATION_MODES={'follow_index': CURSOR}):
+            page = CursorPaginator(follow_feed(self.reader), 3).page()
+            self.assertEqual(list(page), expected[:3])
+            response = self.client.get(
+                reverse('posts:follow_index'),
+                {'after': page.next_cursor},
+            )
+            self.assertEqual(list(response.context['page_obj']), expected[3:])
+
+    def test_count_follows_new_star_posts(self):
+        '''Число постов в ленте не залипает в кэше после поста звезды.'''
+
+        url = reverse('posts:follow_index')
+        response = self.client.get(url)
+        self.assertEqual(response.context['page_obj'].paginator.count, 4)
+        Post.objects.create(text='Пост 4', author=self.star)
+        response = self.client.get(url)
+        self.assertEqual(response.context['page_obj'].paginator.count, 5)
+
+    def test_count_skips_posts_in_both_parts(self):
+        '''Пост звезды, уже лежащий в Timeline, считается один раз.'''
+
+        Timeline.objects.create(
+            user=self.reader,
+            post=self.posts[0],
+            pub_date=self.posts[0].pub_date,
+        )
+        cache.clear()
+        feed = follow_feed(self.reader)
+        self.assertEqual(feed.count(), 4)
+        self.assertEqual(list(feed[0:4]), self.posts[::-1])
+
+    def test_star_below_threshold_is_pushed(self):
+        '''Автор, потерявший подписчиков, раскладывается по лентам.'''
+
+        Follow.objects.filter(user=self.fan, author=self.star).delete()
+        feed = follow_feed(self.reader)
+        self.assertNotIsInstance(feed, HybridFeed)
+        self.assertEqual(list(feed), self.posts[::-1])
+
+
+class FollowStatementTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='newcomer')
+        cls.authors = [
+            User.objects.create_user(username=f'suggested_{i}')
+            for i in range(3)
+        ]
+
+    def profile(self, user):
+        return Profile.objects.get(user=user)
+
+    def test_follow_twice_keeps_one_row(self):
+        '''Повторная подписка не создаёт строку и не меняет счётчики'''
+        author = self.authors[0]
+        self.assertTrue(follow(self.user, author))
+        self.assertFalse(follow(self.user, author))
+        self.assertEqual(
+            Follow.objects.filter(user=self.user, author=author).count(), 1
+        )
+        self.assertEqual(self.profile(author).follower_count, 1)
+        self.assertEqual(self.profile(self.user).following_count, 1)
+        self.assertFalse(follow(self.user, self.user))
+
+    def test_unfollow_twice_is_harmless(self):
+        '''Повторная отписка ничего не удаляет и не трогает счётчики'''
+        author = self.authors[1]
+        follow(self.user, author)
+        self.assertTrue(unfollow(self.user, author))
+        self.assertFalse(unfollow(self.user, author))
+        self.assertEqual(self.profile(author).follower_count, 0)
+        self.assertEqual(self.profile(self.user).following_count, 0)
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('posts:profile_unfollow', args=[author.username])
+        )
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+    def test_constraints_reject_duplicates_and_self_follow(self):
+        '''База не даёт создать дубль подписки и подписку на себя'''
+        Follow.objects.create(user=self.user, author=self.authors[2])
+        for author in (self.authors[2], self.user):
+            with self.subTest(author=author):
+                with self.assertRaises(IntegrityError):
+                    with transaction.atomic():
+                        Follow.objects.create(user=self.user, author=author)
+
+    def test_follow_many_returns_new_authors(self):
+        '''follow_many подписывает на всех и возвращает новых авторов'''
+        follow(self.user, self.authors[0])
+        post = Post.objects.create(text='Пост', author=self.authors[1])
+        created = follow_many(self.user, self.authors)
+        self.assertEqual(created, self.authors[1:])
+        self.assertEqual(self.profile(self.user).following_count, 3)
+        for author in self.authors:
+            self.assertEqual(self.profile(author).follower_count, 1)
+        self.assertEqual(list(follow_feed(self.user)), [post])
+        self.assertEqual(follow_many(self.user, self.authors), [])
+        self.assertEqual(self.profile(self.user).following_count, 3)
+
+    def test_follow_many_inserts_all_pairs_at_once(self):
+        '''follow_many вставляет все подписки одним запросом'''
+        with CaptureQueriesContext(connection) as queries:
+            follow_many(self.user, self.authors + [self.user])
+        inserts = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('INSERT')
+            and 'posts_follow' in query['sql']
+        ]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(
+            Follow.objects.filter(user=self.user).count(), len(self.authors)
+        )
@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 from django.conf import settings
@@ -118,9 +119,10 @@ class PostFormTest(TestCase):
             follow=True
         )
         create_post = Post.objects.exclude(id=self.post.id).first()
+        digest = hashlib.sha256(self.small_gif).hexdigest()
         self.assertEqual(
             create_post.image,
-            f'posts/{self.uploaded}'
+            f'posts/{digest[:2]}/{digest[2:4]}/{digest}.gif'
         )
 
     def test_create_commets_can_user(self):
@@ -0,0 +1,113 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from posts.models import Group, Post, PostTag, Profile, User
+from posts.search import SearchResults
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImportPostsCommandTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='archivist')
+        cls.group = Group.objects.create(
+            title='Архив', slug='archive', description='Старые записи'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+
+    def write(self, name, content):
+        path = os.path.join(self.dir, name)
+        mode = 'wb' if isinstance(content, bytes) else 'w'
+        with open(path, mode) as file:
+            file.write(content)
+        return path
+
+    def write_jsonl(self, rows):
+        return self.write(
+            'posts.jsonl', '\n'.join(json.dumps(row) for row in rows)
+        )
+
+    def run_import(self, path, **options):
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_posts', path, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_jsonl_keeps_dates_and_rebuilds(self):
+        '''Импорт сохраняет даты архива и пересобирает индексы и счётчики'''
+        path = self.write_jsonl([
+            {
+                'text': 'Первая запись про #архив',
+                'author': 'archivist',
+                'group': 'archive',
+                'pub_date': '2010-05-01T12:00:00',
+            },
+            {'text': 'Вторая запись', 'author': 'archivist'},
+            {'text': 'Чужая запись', 'author': 'stranger'},
+            {'text': 'Без группы', 'author': 'archivist', 'group': 'nope'},
+        ])
+        out, err = self.run_import(path, batch_size=1)
+        self.assertIn('Постов: 2', out)
+        self.assertIn("строка 3: нет автора 'stranger'", err)
+        self.assertIn("строка 4: нет группы 'nope'", err)
+        old = Post.objects.get(text__startswith='Первая')
+        self.assertEqual(old.pub_date.year, 2010)
+        self.assertEqual(old.group, self.group)
+        self.assertEqual(SearchResults('первая')[:10], [old])
+        self.assertTrue(PostTag.objects.filter(post=old).exists())
+        self.assertEqual(Profile.objects.get(user=self.author).post_count, 2)
+
+    def test_checkpoint_resumes_import(self):
+        '''С checkpoint повторный запуск продолжает с места остановки'''
+        checkpoint = os.path.join(self.dir, 'checkpoint')
+        path = self.write_jsonl([
+            {'text': f'Запись {i}', 'author': 'archivist'} for i in range(3)
+        ])
+        self.write('checkpoint', '2')
+        self.run_import(path, checkpoint=checkpoint, skip_rebuild=True)
+        self.assertEqual(
+            list(Post.objects.values_list('text', flat=True)), ['Запись 2']
+        )
+        with open(checkpoint) as file:
+            self.assertEqual(file.read(), '3')
+        self.run_import(path, checkpoint=checkpoint, skip_rebuild=True)
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_import_csv_with_images_and_new_users(self):
+        '''CSV с картинками, новые авторы создаются по --create-users'''
+        self.write('cat.gif', SMALL_GIF)
+        path = self.write(
+            'posts.csv',
+            'text,author,image\n'
+            'С картинкой,newcomer,cat.gif\n'
+            'Без файла,archivist,missing.gif\n',
+        )
+        self.run_import(path, image_root=self.dir, create_users=True)
+        post = Post.objects.get(author__username='newcomer')
+        self.assertTrue(post.image.name.startswith('posts/'))
+        self.assertEqual(post.image_width, 2)
+        self.assertEqual(Post.objects.get(text='Без файла').image, '')
@@ -0,0 +1,16 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+
+class ExplainFeedsTests(TestCase):
+    def test_feed_queries_use_indexes(self):
+        '''Запросы лент не сканируют таблицы и не сортируют в памяти.'''
+
+        out = StringIO()
+        call_command(
+            'explain_feeds', posts=2000, users=200, groups=10,
+            strict=True, stdout=out
+        )
+        self.assertIn('follow_index', out.getvalue())
@@ -0,0 +1,76 @@
+import io
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, User
+from posts.search import FTS_TABLE, SearchResults, match_query
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+        cls.rare = Post.objects.create(
+            text='Ёжик в тумане', author=cls.user
+        )
+        cls.frequent = Post.objects.create(
+            text='Туман, туман и снова туман над рекой', author=cls.user
+        )
+        cls.other = Post.objects.create(
+            text='Совсем про другое', author=cls.user
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_match_query_escapes_syntax(self):
+        '''Знаки и операторы FTS5 в запросе не ломают поиск'''
+        self.assertEqual(match_query('туман" OR -*'), '"туман" "or"*')
+        self.assertEqual(match_query('  ?!  '), '')
+        self.assertEqual(list(SearchResults('"(*')[:10]), [])
+
+    def test_ranked_prefix_search(self):
+        '''Поиск без учёта регистра и по префиксу, частые совпадения выше'''
+        self.assertEqual(
+            SearchResults('ТУМАН')[:10], [self.frequent, self.rare]
+        )
+        self.assertEqual(SearchResults('ежик тум')[:10], [self.rare])
+        self.assertEqual(SearchResults('туман').count(), 2)
+
+    def test_index_follows_edits_and_deletes(self):
+        '''Индекс обновляется при правке и удалении поста'''
+        post = Post.objects.get(pk=self.other.pk)
+        post.text = 'Теперь тоже про туман'
+        post.save()
+        self.assertIn(post, SearchResults('туман')[:10])
+        self.assertEqual(SearchResults('другое')[:10], [])
+        Post.objects.filter(pk=self.frequent.pk).delete()
+        self.assertEqual(SearchResults('снова').count(), 0)
+
+    @override_settings(NUM_MSG=1)
+    def test_search_view_keeps_query_in_pages(self):
+        '''Страница поиска ранжирует посты и сохраняет q в ссылках'''
+        response = Client().get(reverse('posts:search'), {'q': 'туман'})
+        self.assertEqual(
+            list(response.context['page_obj']), [self.frequent]
+        )
+        self.assertContains(response, '?q=%D1%82%D1%83%D0%BC%D0%B0%D0%BD'
+                                      '&amp;page=2')
+        response = Client().get(
+            reverse('posts:search'), {'q': 'туман', 'page': 2}
+        )
+        self.assertEqual(list(response.context['page_obj']), [self.rare])
+
+    def test_rebuild_command(self):
+        '''rebuild_search_index восстанавливает очищенный индекс'''
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        self.assertEqual(SearchResults('туман').count(), 0)
+        out = io.StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Проиндексировано постов: 3', out.getvalue())
+        self.assertEqual(SearchResults('туман').count(), 2)
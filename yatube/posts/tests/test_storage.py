@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from posts.models import Post, User
+from posts.thumbnails import process_image, read_variants
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, name, content=SMALL_GIF):
+        return Post.objects.create(
+            text=name,
+            author=self.user,
+            image=SimpleUploadedFile(name, content, 'image/gif'),
+        )
+
+    def test_duplicate_upload_reuses_file(self):
+        '''Одинаковые загрузки хранятся одним файлом под хешем'''
+        first = self.create_post('first.gif')
+        second = self.create_post('SECOND.GIF')
+        other = self.create_post('first.gif', SMALL_GIF + b'\x00')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotEqual(first.image.name, other.image.name)
+        self.assertTrue(first.image.name.startswith('posts/'))
+        self.assertTrue(first.image.name.endswith('.gif'))
+        files = [
+            name for _, _, names in os.walk(TEMP_MEDIA_ROOT)
+            for name in names if name.endswith('.gif')
+        ]
+        self.assertEqual(len(files), 2)
+
+    def test_duplicate_upload_reuses_variants(self):
+        '''Повторная загрузка берёт готовые варианты другого поста'''
+        first = self.create_post('first.gif')
+        process_image(first.id, first.image)
+        second = self.create_post('again.gif')
+        with mock.patch('posts.thumbnails.build_variants') as build:
+            process_image(second.id, second.image)
+        build.assert_not_called()
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(read_variants(second), read_variants(first))
@@ -0,0 +1,91 @@
+import datetime
+import io
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Post, PostTag, Tag, User
+from posts.tags import extract_tags, tag_feed, trending_tags
+
+
+class TagTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+        cls.first = Post.objects.create(
+            text='Утро, #Дача и #ёлка', author=cls.user
+        )
+        cls.second = Post.objects.create(
+            text='Снова #дача, #1 и ссылка /page#anchor', author=cls.user
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def tags_of(self, post):
+        return set(
+            PostTag.objects.filter(post=post).values_list(
+                'tag__name', flat=True
+            )
+        )
+
+    @override_settings(TAG_MAX_PER_POST=2)
+    def test_extract_tags(self):
+        '''Теги в нижнем регистре, без чисел, якорей, повторов и лишних'''
+        self.assertEqual(
+            extract_tags('#Ёж и #ёж, #42, a#b, &#39; /x#y #кот #пёс'),
+            ['еж', 'кот'],
+        )
+
+    def test_tags_follow_edits(self):
+        '''Теги сохраняются с постом и меняются вместе с текстом'''
+        self.assertEqual(self.tags_of(self.first), {'дача', 'елка'})
+        self.assertEqual(self.tags_of(self.second), {'дача'})
+        post = Post.objects.get(pk=self.first.pk)
+        post.text = 'Теперь про #море'
+        post.save()
+        self.assertEqual(self.tags_of(post), {'море'})
+        self.assertEqual(
+            list(tag_feed(Tag.objects.get(name='дача'))), [self.second]
+        )
+
+    def test_tag_page_lists_newest_first(self):
+        '''Лента тега показывает посты с тегом от новых к старым'''
+        response = Client().get(
+            reverse('posts:tag_posts', args=['ДАЧА'])
+        )
+        self.assertEqual(
+            list(response.context['page_obj']), [self.second, self.first]
+        )
+        self.assertContains(
+            response, reverse('posts:tag_posts', args=['елка'])
+        )
+        response = Client().get(reverse('posts:tag_posts', args=['нет']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_tag_page_sees_new_posts(self):
+        '''Новый пост с тегом сразу попадает в закэшированную ленту тега'''
+        url = reverse('posts:tag_posts', args=['дача'])
+        Client().get(url)
+        post = Post.objects.create(text='#дача', author=self.user)
+        response = Client().get(url)
+        self.assertEqual(response.context['page_obj'][0], post)
+        self.assertEqual(response.context['page_obj'].paginator.count, 3)
+
+    def test_trending_tags_counts_recent_posts(self):
+        '''Популярные теги считаются только по свежим постам'''
+        PostTag.objects.filter(post=self.first).update(
+            pub_date=timezone.now() - datetime.timedelta(days=30)
+        )
+        self.assertEqual(trending_tags(), [('дача', 1)])
+
+    def test_rebuild_tags_command(self):
+        '''Команда rebuild_tags восстанавливает теги по текстам постов'''
+        PostTag.objects.all().delete()
+        out = io.StringIO()
+        call_command('rebuild_tags', batch_size=1, stdout=out)
+        self.assertIn('3', out.getvalue())
+        self.assertEqual(self.tags_of(self.first), {'дача', 'елка'})
@@ -0,0 +1,410 @@
+import base64
+import io
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import get_thumbnail
+
+from core.models import Task
+from core.tasks import DONE, run_pending
+from posts.models import Post, User
+from posts.templatetags.post_images import post_image
+from posts.thumbnails import (
+    build_variants,
+    generate_thumbnails,
+    process_image,
+    read_variants,
+    save_variants,
+)
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def upload(self, name='small.gif'):
+        return SimpleUploadedFile(name, SMALL_GIF, content_type='image/gif')
+
+    def test_rendering_uses_pregenerated_thumbnail(self):
+        '''После фоновой генерации шаблон не создаёт миниатюру заново'''
+        post = Post.objects.create(
+            text='С картинкой', author=self.user, image=self.upload()
+        )
+        generate_thumbnails(post.image)
+        geometry, options = settings.POST_THUMBNAIL_GEOMETRIES[0]
+        url = get_thumbnail(post.image, geometry, **options).url
+        with mock.patch(
+            'sorl.thumbnail.base.ThumbnailBackend._create_thumbnail'
+        ) as create:
+            response = self.client.get(reverse('posts:index'))
+        create.assert_not_called()
+        self.assertContains(response, url)
+
+    def test_missing_file_is_skipped(self):
+        '''Картинка без файла в хранилище пропускается без ошибки'''
+        post = Post.objects.create(
+            text='Без файла', author=self.user, image='posts/missing.gif'
+        )
+        with mock.patch('posts.thumbnails.get_thumbnail') as thumbnail:
+            generate_thumbnails(post.image)
+        thumbnail.assert_not_called()
+
+    def test_create_and_edit_schedule_thumbnails(self):
+        '''Создание поста и замена картинки ставят генерацию в очередь'''
+        with mock.patch('posts.views.schedule_thumbnails') as schedule:
+            self.client.post(
+                reverse('posts:post_create'),
+                {'text': 'Новый', 'image': self.upload()},
+            )
+            post = Post.objects.get(text='Новый')
+            self.client.post(
+                reverse('posts:post_edit', args=(post.id,)),
+                {'text': 'Без новой картинки'},
+            )
+            self.assertEqual(schedule.call_count, 1)
+            self.client.post(
+                reverse('posts:post_edit', args=(post.id,)),
+                {'text': 'С новой', 'image': self.upload('other.gif')},
+            )
+        self.assertEqual(schedule.call_count, 2)
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    POST_IMAGE_WIDTHS=(480, 960, 1440),
+    POST_IMAGE_FORMATS=('webp', 'jpeg'),
+)
+class ImageVariantTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='variants')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def upload(self, name='photo.jpg', size=(1200, 600), color=(200, 30, 30)):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, color).save(buffer, 'JPEG')
+        return SimpleUploadedFile(
+            name, buffer.getvalue(), content_type='image/jpeg'
+        )
+
+    def test_variants_do_not_upscale(self):
+        '''Варианты есть для каждой ширины не больше исходника'''
+        post = Post.objects.create(
+            text='Фото', author=self.user, image=self.upload()
+        )
+        manifest = build_variants(post.image)
+        self.assertEqual(manifest['src'], post.image.name)
+        for fmt in ('webp', 'jpeg'):
+            variants = manifest['variants'][fmt]
+            self.assertEqual(
+                [(w, h) for w, h, _ in variants], [(480, 169), (960, 339)]
+            )
+            for width, height, name in variants:
+                self.assertTrue(default_storage.exists(name))
+                with default_storage.open(name) as file:
+                    img = Image.open(file)
+                    self.assertEqual(img.size, (width, height))
+                    self.assertEqual(img.format, fmt.upper())
+
+    def test_render_uses_manifest_only(self):
+        '''Карточка строит srcset по манифесту, не трогая файлы'''
+        post = Post.objects.create(
+            text='Фото', author=self.user, image=self.upload()
+        )
+        version = post.card_version
+        process_image(post.id, post.image)
+        post.refresh_from_db()
+        self.assertGreater(post.card_version, version)
+        self.assertIsNotNone(read_variants(post))
+        with mock.patch(
+            'django.core.files.storage.FileSystemStorage.open'
+        ) as open_, mock.patch(
+            'django.core.files.storage.FileSystemStorage.exists'
+        ) as exists, mock.patch(
+            'sorl.thumbnail.templatetags.thumbnail.default.backend'
+        ) as backend:
+            response = Client().get(reverse('posts:index'))
+        open_.assert_not_called()
+        exists.assert_not_called()
+        backend.get_thumbnail.assert_not_called()
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, '480.webp 480w')
+        self.assertContains(response, '960.jpeg 960w')
+        self.assertContains(response, 'width="960" height="339"')
+        self.assertContains(response, 'loading="lazy"')
+        self.assertContains(response, post.image_placeholder)
+        response = Client().get(
+            reverse('posts:post_detail', args=(post.id,))
+        )
+        self.assertNotContains(response, 'loading="lazy"')
+
+    def test_stale_manifest_is_ignored(self):
+        '''Манифест старой картинки не применяется к новой'''
+        post = Post.objects.create(
+            text='Фото', author=self.user, image=self.upload()
+        )
+        old_name = post.image.name
+        manifest = build_variants(post.image)
+        post.image = self.upload('other.jpg', color=(30, 200, 30))
+        post.save()
+        self.assertFalse(save_variants(post.id, old_name, manifest))
+        post.image_variants = '{"src": "%s"}' % old_name
+        self.assertIsNone(read_variants(post))
+
+    def manifest_post(self, *formats):
+        name = 'posts/manifest.jpg'
+        variants = {
+            fmt: [[480, 169, f'posts/variants/1/480.{fmt}']]
+            for fmt in formats
+        }
+        return Post(
+            image=name,
+            image_variants=json.dumps({'src': name, 'variants': variants}),
+        )
+
+    @override_settings(POST_IMAGE_FORMATS=('avif',))
+    def test_manifest_without_current_formats_uses_thumbnail(self):
+        '''Без форматов из настроек выводится обычная миниатюра'''
+        context = post_image(self.manifest_post('webp', 'jpeg'))
+        self.assertIsNone(context['image'])
+
+    @override_settings(POST_IMAGE_FORMATS=('png', 'unknown', 'jpeg'))
+    def test_unknown_mime_type_is_skipped(self):
+        '''Формат с неизвестным MIME-типом не попадает в <source>'''
+        context = post_image(self.manifest_post('png', 'unknown', 'jpeg'))
+        self.assertEqual(
+            [source['type'] for source in context['image']['sources']],
+            ['image/png'],
+        )
+        self.assertTrue(context['image']['src'].endswith('480.jpeg'))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class WarmThumbnailsCommandTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='warm')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def warm(self, *args):
+        out = io.StringIO()
+        call_command('warm_thumbnails', '--workers=1', *args, stdout=out)
+        return out.getvalue()
+
+    def upload(self, name):
+        return SimpleUploadedFile(name, SMALL_GIF, content_type='image/gif')
+
+    def test_warm_skips_ready_images(self):
+        '''Повторный прогрев пропускает готовые картинки'''
+        post = Post.objects.create(
+            text='Есть', author=self.user, image=self.upload('a.gif')
+        )
+        Post.objects.create(
+            text='Нет файла', author=self.user, image='posts/none.gif'
+        )
+        Post.objects.create(text='Без картинки', author=self.user)
+        out = self.warm()
+        self.assertIn('Картинок: 2', out)
+        self.assertIn('создано: 1, готово: 0, нет файла: 1', out)
+        post.refresh_from_db()
+        self.assertTrue(post.image_variants)
+        out = self.warm()
+        self.assertIn('создано: 0, готово: 1, нет файла: 1', out)
+
+    def test_lost_thumbnail_file_is_recreated(self):
+        '''Пропавший файл миниатюры создаётся заново'''
+        post = Post.objects.create(
+            text='Есть', author=self.user, image=self.upload('b.gif')
+        )
+        self.warm()
+        geometry, options = settings.POST_THUMBNAIL_GEOMETRIES[0]
+        thumbnail = get_thumbnail(post.image, geometry, **options)
+        thumbnail.delete()
+        out = self.warm()
+        self.assertIn('создано: 1', out)
+        self.assertTrue(thumbnail.exists())
+
+    def test_resume_from_checkpoint(self):
+        '''Прогрев продолжается после id из файла контрольной точки'''
+        first = Post.objects.create(
+            text='Первый', author=self.user, image=self.upload('c.gif')
+        )
+        last = Post.objects.create(
+            text='Второй', author=self.user, image=self.upload('d.gif')
+        )
+        checkpoint = os.path.join(TEMP_MEDIA_ROOT, 'warm.checkpoint')
+        with open(checkpoint, 'w') as file:
+            file.write(str(first.id))
+        out = self.warm(f'--checkpoint={checkpoint}')
+        self.assertIn('Картинок: 1', out)
+        with open(checkpoint) as file:
+            self.assertEqual(file.read(), str(last.id))
+        out = self.warm(f'--checkpoint={checkpoint}', '--restart')
+        self.assertIn('Картинок: 2', out)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageMetadataTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='metadata')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def upload(self, size=(300, 200)):
+        buffer = io.BytesIO()
+        img = Image.new('RGB', size, (10, 20, 30))
+        img.paste((250, 250, 250), (0, 0, 10, 10))
+        img.save(buffer, 'PNG')
+        return SimpleUploadedFile(
+            'meta.png', buffer.getvalue(), content_type='image/png'
+        )
+
+    def test_metadata_is_stored_on_upload(self):
+        '''Метаданные картинки сохраняются при загрузке'''
+        upload = self.upload()
+        post = Post.objects.create(text='Фото', author=self.user, image=upload)
+        post.refresh_from_db()
+        self.assertEqual(post.image_width, 300)
+        self.assertEqual(post.image_height, 200)
+        self.assertEqual(post.image_format, 'png')
+        self.assertEqual(post.image_size, upload.size)
+        self.assertEqual(post.image_color, '#0a141e')
+        prefix = 'data:image/jpeg;base64,'
+        self.assertTrue(post.image_placeholder.startswith(prefix))
+        data = base64.b64decode(post.image_placeholder[len(prefix):])
+        self.assertEqual(Image.open(io.BytesIO(data)).size, (16, 5))
+
+    def test_metadata_follows_image_changes(self):
+        '''Метаданные остаются при правке текста и сбрасываются с картинкой'''
+        post = Post.objects.create(
+            text='Фото', author=self.user, image=self.upload()
+        )
+        post.text = 'Новый текст'
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.image_width, 300)
+        post.image = 'posts/other.png'
+        post.save()
+        post.refresh_from_db()
+        self.assertIsNone(post.image_width)
+        self.assertEqual(post.image_color, '')
+        self.assertEqual(post.image_placeholder, '')
+
+    def test_backfill_command(self):
+        '''backfill_image_metadata заполняет пустые метаданные'''
+        post = Post.objects.create(
+            text='Фото', author=self.user, image=self.upload((40, 50))
+        )
+        Post.objects.create(
+            text='Нет файла', author=self.user, image='posts/none.png'
+        )
+        Post.objects.filter(pk=post.pk).update(
+            image_width=None,
+            image_height=None,
+            image_color='',
+            image_placeholder='',
+        )
+        version = Post.objects.get(pk=post.pk).card_version
+        out = io.StringIO()
+        call_command('backfill_image_metadata', stdout=out)
+        self.assertIn('Обновлено картинок: 1, не прочитано: 1', out.getvalue())
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (40, 50))
+        self.assertEqual(post.image_color, '#0a141e')
+        self.assertEqual(post.card_version, version + 1)
+        self.assertTrue(post.image_placeholder)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class BackgroundImageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='background')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, text):
+        client = Client()
+        client.force_login(self.user)
+        buffer = io.BytesIO()
+        Image.new('RGB', (600, 300), (1, 2, 3)).save(buffer, 'PNG')
+        client.post(reverse('posts:post_create'), {
+            'text': text,
+            'image': SimpleUploadedFile('bg.png', buffer.getvalue()),
+        })
+        return Post.objects.get(text=text)
+
+    @override_settings(TASKS_EAGER=False)
+    def test_image_is_processed_by_task_queue(self):
+        '''Запрос только ставит задачу, картинку обрабатывает очередь'''
+        post = self.create_post('Фоновая обработка')
+        self.assertIsNone(read_variants(post))
+        task = Task.objects.get(name='posts.process_image')
+        self.assertEqual(task.dedupe_key, f'post-image:{post.pk}:{post.image}')
+        # Картинка и раскладка поста по лентам подписчиков.
+        self.assertEqual(run_pending(), {DONE: 2})
+        post.refresh_from_db()
+        self.assertIsNotNone(read_variants(post))
+        self.assertFalse(Task.objects.exists())
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager_tasks_process_image_in_request(self):
+        '''С TASKS_EAGER картинка обрабатывается в самом запросе'''
+        post = self.create_post('Сразу')
+        self.assertIsNotNone(read_variants(post))
+        self.assertFalse(Task.objects.exists())
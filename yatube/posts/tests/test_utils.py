@@ -1,10 +1,20 @@
-from django.test import Client, TestCase
+import json
+
+from django.test import Client, TestCase, override_settings
 from typing import List
-from posts.models import Post, Group, User
+from posts.models import Post, Group, Profile, User
+from posts.utils import (
+    CURSOR, CachedCountPaginator, CursorPage, count_scope
+)
 from django.core.cache import cache
+from django.utils.http import urlsafe_base64_encode
 ALL_POST = 13
 TEN_POSTS = 10
 THREE_POSTS = 3
+# С кэшем в памяти попадание в кэш не стоит ни одного запроса.
+LOCMEM_CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+}}
 
 
 class PaginatorTests(TestCase):
@@ -58,3 +68,114 @@ class PaginatorTests(TestCase):
                         len(self.client.get(url).context['page_obj']),
                         number_posts
                     )
+
+
+@override_settings(PAGINATION_MODES={'index': CURSOR, 'profile': CURSOR})
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='CursorUser')
+        Post.objects.bulk_create(
+            Post(text=f'Пост номер {i}', author=cls.user)
+            for i in range(ALL_POST)
+        )
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def walk(self, url):
+        '''Собирает все посты, переходя по курсору next.'''
+        seen = []
+        page = self.client.get(url).context['page_obj']
+        seen.extend(page)
+        while page.has_next():
+            page = self.client.get(
+                url, {'after': page.next_cursor}
+            ).context['page_obj']
+            seen.extend(page)
+        return seen
+
+    def test_cursor_pages_cover_feed(self):
+        '''Курсорные страницы отдают все посты без повторов'''
+
+        for url in ('/', f'/profile/{self.user.username}/'):
+            with self.subTest(url=url):
+                seen = self.walk(url)
+                expected = list(Post.objects.order_by('-pub_date', '-id'))
+                self.assertEqual(seen, expected)
+
+    def test_cursor_previous_page(self):
+        '''Курсор before возвращает предыдущую страницу'''
+
+        first = self.client.get('/').context['page_obj']
+        self.assertIsInstance(first, CursorPage)
+        self.assertFalse(first.has_previous())
+        self.assertEqual(len(first), TEN_POSTS)
+        second = self.client.get(
+            '/', {'after': first.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(second), THREE_POSTS)
+        self.assertFalse(second.has_next())
+        back = self.client.get(
+            '/', {'before': second.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+
+    def test_broken_cursor_returns_first_page(self):
+        '''Битый курсор отдаёт первую страницу'''
+
+        page = self.client.get('/', {'after': 'broken'}).context['page_obj']
+        self.assertEqual(len(page), TEN_POSTS)
+        self.assertFalse(page.has_previous())
+
+    def test_cursor_past_last_post_returns_first_page(self):
+        '''Курсор за последним постом отдаёт первую страницу'''
+
+        cursor = urlsafe_base64_encode(
+            json.dumps(['2000-01-01T00:00:00+00:00', '1']).encode()
+        )
+        response = self.client.get('/', {'after': cursor})
+        self.assertEqual(response.status_code, 200)
+        page = response.context['page_obj']
+        self.assertEqual(len(page), TEN_POSTS)
+        self.assertFalse(page.has_previous())
+
+
+class CachedCountPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='CountUser')
+        Post.objects.bulk_create(
+            Post(text=f'Пост номер {i}', author=cls.user)
+            for i in range(ALL_POST)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def paginator(self):
+        return CachedCountPaginator(
+            self.user.posts.all(), TEN_POSTS,
+            count_scope('author', self.user.id)
+        )
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_count_is_cached_until_post_created(self):
+        '''Число постов берётся из кэша и сбрасывается новым постом.'''
+
+        self.assertEqual(self.paginator().count, ALL_POST)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.paginator().count, ALL_POST)
+        Post.objects.create(text='Новый пост', author=self.user)
+        self.assertEqual(self.paginator().count, ALL_POST + 1)
+
+    @override_settings(PAGINATOR_ESTIMATE_THRESHOLD=THREE_POSTS)
+    def test_estimate_above_threshold(self):
+        '''Выше порога используется оценка из счётчика профиля.'''
+
+        Profile.objects.filter(user=self.user).update(post_count=1000)
+        self.assertEqual(self.paginator().count, 1000)
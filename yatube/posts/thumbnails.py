@@ -0,0 +1,304 @@
+import base64
+import hashlib
+import io
+import json
+import logging
+import mimetypes
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageFilter
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from core.tasks import task
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = 'posts/variants/{}/'
+MIME_TYPES = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+
+# Итоги прогрева одной картинки.
+WARMED = 'warmed'
+SKIPPED = 'skipped'
+MISSING = 'missing'
+FAILED = 'failed'
+
+
+def generate_thumbnails(image):
+    """Создаёт миниатюры POST_THUMBNAIL_GEOMETRIES для картинки поста.
+
+    Геометрия и опции совпадают с тегами {% thumbnail %} в шаблонах,
+    поэтому при рендере sorl находит готовый файл в своём хранилище
+    ключей и не открывает исходник. Отсутствующий файл пропускается.
+    """
+    if not image or not image.storage.exists(image.name):
+        return
+    for geometry, options in settings.POST_THUMBNAIL_GEOMETRIES:
+        get_thumbnail(image, geometry, **options)
+
+
+def image_metadata(file):
+    """Размеры, формат, размер в байтах, основной цвет и заглушка.
+
+    Основной цвет - самый частый цвет палитры из пяти цветов,
+    построенной по уменьшенной копии.
+    """
+    if file.seekable():
+        file.seek(0)
+    img = Image.open(file)
+    width, height = img.size
+    metadata = {
+        'image_width': width,
+        'image_height': height,
+        'image_format': (img.format or '').lower(),
+        'image_size': file.size,
+    }
+    img.thumbnail((64, 64))
+    img = img.convert('RGB')
+    palette = img.quantize(colors=5)
+    _, index = max(palette.getcolors())
+    red, green, blue = palette.getpalette()[index * 3:index * 3 + 3]
+    metadata['image_color'] = f'#{red:02x}{green:02x}{blue:02x}'
+    metadata['image_placeholder'] = image_placeholder(img)
+    if file.seekable():
+        file.seek(0)
+    return metadata
+
+
+def image_placeholder(img):
+    """Размытая микро-копия кадра карточки в виде data URI."""
+    ratio_w, ratio_h = settings.POST_IMAGE_RATIO
+    width = settings.POST_IMAGE_PLACEHOLDER_WIDTH
+    height = max(1, width * ratio_h // ratio_w)
+    tiny = _crop_to_ratio(img).resize((width, height), Image.BILINEAR)
+    tiny = tiny.filter(ImageFilter.GaussianBlur(1))
+    buffer = io.BytesIO()
+    tiny.save(buffer, 'JPEG', quality=50)
+    data = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/jpeg;base64,{data}'
+
+
+def update_image_metadata(post, old_name=None):
+    """Заполняет поля метаданных картинки поста перед сохранением.
+
+    Только что загруженный файл ещё не записан в хранилище и читается
+    из памяти. Если картинку заменили уже сохранённым файлом, поля
+    остаются пустыми до запуска backfill_image_metadata.
+    """
+    image = post.image
+    if image and image._committed and image.name == old_name:
+        return
+    metadata = {
+        'image_width': None,
+        'image_height': None,
+        'image_format': '',
+        'image_size': None,
+        'image_color': '',
+        'image_placeholder': '',
+    }
+    if image and not image._committed:
+        try:
+            metadata = image_metadata(image.file)
+        except (OSError, ValueError):
+            logger.warning('Не удалось прочитать картинку %s', image.name)
+    for field, value in metadata.items():
+        setattr(post, field, value)
+
+
+def _crop_to_ratio(img):
+    """Обрезает картинку по центру до пропорций POST_IMAGE_RATIO."""
+    ratio_w, ratio_h = settings.POST_IMAGE_RATIO
+    width, height = img.size
+    if width * ratio_h > height * ratio_w:
+        new_width = height * ratio_w // ratio_h
+        left = (width - new_width) // 2
+        return img.crop((left, 0, left + new_width, height))
+    new_height = width * ratio_h // ratio_w
+    top = (height - new_height) // 2
+    return img.crop((0, top, width, top + new_height))
+
+
+def _widths(source_width):
+    """Ширины вариантов без увеличения; самая узкая есть всегда."""
+    widths = sorted(settings.POST_IMAGE_WIDTHS)
+    return [w for w in widths if w <= source_width] or widths[:1]
+
+
+def build_variants(image):
+    """Создаёт варианты картинки и возвращает манифест.
+
+    Каждая ширина из POST_IMAGE_WIDTHS сохраняется во всех форматах
+    POST_IMAGE_FORMATS. Варианты, как и миниатюры sorl, лежат в
+    default_storage в каталоге, имя которого зависит от имени
+    исходника, так что новая картинка получает новые адреса.
+    """
+    storage = default_storage
+    folder = VARIANTS_DIR.format(
+        hashlib.sha1(image.name.encode()).hexdigest()[:16]
+    )
+    with image.storage.open(image.name) as source:
+        img = Image.open(source)
+        img.load()
+    img = _crop_to_ratio(img.convert('RGB'))
+    ratio_w, ratio_h = settings.POST_IMAGE_RATIO
+    variants = {fmt: [] for fmt in settings.POST_IMAGE_FORMATS}
+    for width in _widths(img.width):
+        height = max(1, width * ratio_h // ratio_w)
+        resized = img.resize((width, height), Image.LANCZOS)
+        for fmt in settings.POST_IMAGE_FORMATS:
+            buffer = io.BytesIO()
+            resized.save(
+                buffer, fmt.upper(), quality=settings.POST_IMAGE_QUALITY
+            )
+            name = f'{folder}{width}.{fmt}'
+            if storage.exists(name):
+                storage.delete(name)
+            name = storage.save(name, ContentFile(buffer.getvalue()))
+            variants[fmt].append([width, height, name])
+    return {'src': image.name, 'variants': variants}
+
+
+def save_variants(post_id, image_name, manifest):
+    """Записывает манифест, если картинку поста не успели заменить.
+
+    Пост сохраняется через save(), чтобы сигналы сдвинули версию
+    карточки и поколения закэшированных страниц.
+    """
+    post = Post.objects.select_related('author').filter(
+        pk=post_id, image=image_name
+    ).first()
+    if post is None:
+        return False
+    post.image_variants = json.dumps(manifest, separators=(',', ':'))
+    post.save(update_fields=['image_variants', 'card_version'])
+    return True
+
+
+def mime_type(fmt):
+    """MIME-тип формата вариантов или None, если он неизвестен."""
+    return MIME_TYPES.get(fmt) or mimetypes.guess_type(f'image.{fmt}')[0]
+
+
+def read_variants(post):
+    """Манифест вариантов картинки поста или None, если он устарел."""
+    if not post.image or not post.image_variants:
+        return None
+    try:
+        manifest = json.loads(post.image_variants)
+    except ValueError:
+        return None
+    if manifest.get('src') != post.image.name:
+        return None
+    return manifest
+
+
+def shared_variants(post_id, image_name):
+    """Готовый манифест другого поста с тем же файлом картинки.
+
+    Хранилище с адресацией по содержимому отдаёт повторной загрузке
+    имя уже лежащего файла, поэтому его варианты можно не строить.
+    """
+    rows = Post.objects.filter(image=image_name).exclude(
+        pk=post_id
+    ).exclude(image_variants='').values_list('image_variants', flat=True)
+    for image_variants in rows[:1]:
+        other = Post(image=image_name, image_variants=image_variants)
+        if variants_ready(other):
+            return read_variants(other)
+    return None
+
+
+def process_image(post_id, image):
+    """Миниатюры и варианты картинки; отсутствующий файл пропускается."""
+    if not image or not image.storage.exists(image.name):
+        return
+    generate_thumbnails(image)
+    manifest = shared_variants(post_id, image.name)
+    if manifest is None:
+        manifest = build_variants(image)
+    save_variants(post_id, image.name, manifest)
+
+
+def warm_thumbnails(image):
+    """Создаёт недостающие миниатюры, чиня ссылки на пропавшие файлы.
+
+    Возвращает True, если все миниатюры уже были готовы.
+    """
+    ready = default.kvstore.get(ImageFile(image)) is not None
+    for geometry, options in settings.POST_THUMBNAIL_GEOMETRIES:
+        thumbnail = get_thumbnail(image, geometry, **options)
+        if not thumbnail.exists():
+            default.kvstore.delete(thumbnail, delete_thumbnails=False)
+            get_thumbnail(image, geometry, **options)
+            ready = False
+    return ready
+
+
+def variants_ready(post):
+    """Манифест свежий, все форматы на месте и файлы существуют."""
+    manifest = read_variants(post)
+    if manifest is None:
+        return False
+    variants = manifest.get('variants', {})
+    if set(variants) != set(settings.POST_IMAGE_FORMATS):
+        return False
+    return all(
+        default_storage.exists(name)
+        for rows in variants.values() for _, _, name in rows
+    )
+
+
+def warm_post(row):
+    """Прогревает картинку поста; подходит для пула процессов.
+
+    row - кортеж (pk, image, image_variants). Возвращает WARMED,
+    SKIPPED, MISSING или FAILED.
+    """
+    pk, name, image_variants = row
+    post = Post(pk=pk, image=name, image_variants=image_variants)
+    image = post.image
+    try:
+        if not image.storage.exists(name):
+            return MISSING
+        ready = variants_ready(post)
+        if not ready:
+            manifest = shared_variants(pk, name) or build_variants(image)
+            save_variants(pk, name, manifest)
+        if not warm_thumbnails(image):
+            ready = False
+    except Exception:
+        logger.exception('Не удалось прогреть картинку %s', name)
+        return FAILED
+    return SKIPPED if ready else WARMED
+
+
+@task(name='posts.process_image')
+def process_post_image(post_id, image_name):
+    """Задача очереди: обрабатывает картинку, если её не успели заменить."""
+    post = Post.objects.filter(pk=post_id, image=image_name).only(
+        'pk', 'image'
+    ).first()
+    if post is None:
+        return
+    process_image(post_id, post.image)
+
+
+def schedule_thumbnails(post):
+    """Ставит обработку картинки поста в очередь задач.
+
+    Задача пишется в той же транзакции, что и пост, и обработчики
+    run_workers увидят её только после коммита. Повторное сохранение
+    той же картинки до обработки не ставит вторую задачу.
+    """
+    image = post.image
+    if not image:
+        return
+    process_post_image.delay(
+        post.pk,
+        image.name,
+        dedupe_key=f'post-image:{post.pk}:{image.name}'[:200],
+    )
@@ -7,11 +7,19 @@ app_name = 'posts'
 urlpatterns = [
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('', views.index, name='index'),
+    path('search/', views.search, name='search'),
+    path('tags/<str:name>/', views.tag_posts, name='tag_posts'),
+    path('export/<str:kind>/', views.export, name='export'),
     re_path(r'.+html', views.index, name='index_all'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='post_create'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.comment_list,
+        name='comment_list'
+    ),
     path(
         'posts/<int:post_id>/comment/',
         views.add_comment,
@@ -1,8 +1,260 @@
+import json
+
 from django.conf import settings
-from django.core.paginator import Paginator
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Max, Q, Sum
+from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from .models import Post, Profile
+
+CLASSIC = 'classic'
+CURSOR = 'cursor'
+COUNT_KEY = 'paginator:count:{}'
+
+
+class CursorPage(Page):
+    """Страница курсорной пагинации.
+
+    Повторяет интерфейс Page, который использует шаблон
+    posts/includes/paginator.html, но вместо номеров страниц
+    отдаёт непрозрачные токены next_cursor и previous_cursor.
+    """
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<CursorPage of %s objects>' % len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    @cached_property
+    def next_cursor(self):
+        if not self._has_next or not self.object_list:
+            return None
+        return self.paginator.encode_cursor(self.object_list[-1])
+
+    @cached_property
+    def previous_cursor(self):
+        if not self._has_previous or not self.object_list:
+            return None
+        return self.paginator.encode_cursor(self.object_list[0])
+
+
+class CursorPaginator(Paginator):
+    """Пагинация по ключу (keyset) вместо COUNT(*) и LIMIT/OFFSET.
+
+    Страница выбирается условием на поля ordering относительно
+    граничной записи, поэтому любая страница стоит одинаково
+    при наличии индекса по этим полям.
+    """
+
+    def __init__(self, object_list, per_page,
+                 ordering=('-pub_date', '-id')):
+        super().__init__(object_list, per_page)
+        self.ordering = tuple(ordering)
+        self.fields = [field.lstrip('-') for field in self.ordering]
+        self.descending = [field.startswith('-') for field in self.ordering]
+
+    @cached_property
+    def count(self):
+        return None
+
+    @cached_property
+    def num_pages(self):
+        return None
+
+    @property
+    def page_range(self):
+        return range(0)
+
+    def encode_cursor(self, obj):
+        values = [
+            self._field(name).value_to_string(obj) for name in self.fields
+        ]
+        return urlsafe_base64_encode(json.dumps(values).encode())
+
+    def decode_cursor(self, cursor):
+        """Возвращает значения полей курсора или None, если он битый."""
+        if not cursor:
+            return None
+        try:
+            values = json.loads(urlsafe_base64_decode(cursor).decode())
+            if len(values) != len(self.fields):
+                return None
+            return [
+                self._field(name).to_python(value)
+                for name, value in zip(self.fields, values)
+            ]
+        except (ValueError, TypeError, ValidationError):
+            return None
+
+    def get_page(self, after=None, before=None):
+        """Как Paginator.get_page: битый курсор даёт первую страницу."""
+        return self.page(
+            after=self.decode_cursor(after),
+            before=self.decode_cursor(before),
+        )
+
+    def page(self, after=None, before=None):
+        limit = self.per_page + 1
+        if before is not None:
+            rows = self._fetch(before, reverse=True, limit=limit)
+            if not rows:
+                return self.page()
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            return CursorPage(rows, self, True, has_previous)
+        rows = self._fetch(after, reverse=False, limit=limit)
+        if after is not None and not rows:
+            # Курсор за последней записью: её удалили или курсор
+            # подделан. Пустая страница без курсора назад сломала бы
+            # ссылку «Предыдущая», поэтому отдаётся первая страница.
+            return self.page()
+        has_next = len(rows) > self.per_page
+        return CursorPage(
+            rows[:self.per_page], self, has_next, after is not None
+        )
+
+    def _field(self, name):
+        return self.object_list.model._meta.get_field(name)
+
+    def _fetch(self, key, reverse, limit):
+        if hasattr(self.object_list, 'fetch_keyset'):
+            return self.object_list.fetch_keyset(key, reverse, limit)
+        queryset = self.object_list
+        if key is not None:
+            queryset = queryset.filter(self._keyset_q(key, reverse))
+        ordering = self.ordering
+        if reverse:
+            ordering = [
+                name if desc else '-' + name
+                for name, desc in zip(self.fields, self.descending)
+            ]
+        return list(queryset.order_by(*ordering)[:limit])
+
+    def _keyset_q(self, key, reverse):
+        """Условие «строго после key» в порядке ordering.
+
+        Для (pub_date, id) по убыванию это
+        pub_date <= d AND (pub_date < d OR (pub_date = d AND id < i)).
+        Первое слагаемое задаёт диапазон по индексу, без него SQLite
+        разворачивает OR в MULTI-INDEX OR с сортировкой в памяти.
+        """
+        condition = Q()
+        for i, name in enumerate(self.fields):
+            lookup = 'lt' if self.descending[i] != reverse else 'gt'
+            step = Q(**{'%s__%s' % (name, lookup): key[i]})
+            for prev_name, prev_value in zip(self.fields[:i], key[:i]):
+                step &= Q(**{prev_name: prev_value})
+            condition |= step
+        lookup = 'lte' if self.descending[0] != reverse else 'gte'
+        return Q(**{'%s__%s' % (self.fields[0], lookup): key[0]}) & condition
+
+
+def count_scope(kind, pk=None):
+    """Область ленты для кэша счётчика: 'global', 'group:1', ..."""
+    return kind if pk is None else f'{kind}:{pk}'
+
+
+def forget_counts(*scopes):
+    cache.delete_many([COUNT_KEY.format(scope) for scope in scopes])
+
+
+def cached_count(scope, compute):
+    """Число постов области из кэша; при промахе - compute()."""
+    key = COUNT_KEY.format(scope)
+    count = cache.get(key)
+    if count is None:
+        count = compute()
+        cache.set(key, count, settings.PAGINATOR_COUNT_CACHE_TIME)
+    return count
+
+
+def estimate_count(scope):
+    """Дешёвая оценка числа постов в области или None."""
+    kind, _, pk = scope.partition(':')
+    if kind == 'global':
+        return Post.objects.aggregate(last=Max('pk'))['last'] or 0
+    if kind == 'author':
+        return Profile.objects.filter(user_id=pk).values_list(
+            'post_count', flat=True
+        ).first()
+    if kind == 'follow':
+        return Profile.objects.filter(
+            user__following__user_id=pk
+        ).aggregate(total=Sum('post_count'))['total']
+    return None
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator, который берёт число объектов из кэша области ленты.
+
+    Кэш сбрасывается при создании и удалении постов. Если объектов
+    больше PAGINATOR_ESTIMATE_THRESHOLD, вместо точного COUNT(*)
+    используется оценка estimate_count.
+    """
+
+    def __init__(self, object_list, per_page, scope, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.scope = scope
+
+    @cached_property
+    def count(self):
+        return cached_count(self.scope, self._count)
+
+    def _count(self):
+        if not hasattr(self.object_list, 'query'):
+            return len(self.object_list)
+        threshold = settings.PAGINATOR_ESTIMATE_THRESHOLD
+        count = self.object_list.order_by()[:threshold + 1].count()
+        if count <= threshold:
+            return count
+        estimate = estimate_count(self.scope)
+        if estimate is None:
+            return self.object_list.count()
+        return max(estimate, count)
+
+
+def get_pagination_mode(request):
+    match = getattr(request, 'resolver_match', None)
+    view_name = match.url_name if match else None
+    return settings.PAGINATION_MODES.get(
+        view_name, settings.PAGINATION_DEFAULT_MODE
+    )
+
+
+def comment_page(request, comments):
+    """Порция комментариев по курсору ?after= в порядке написания."""
+    paginator = CursorPaginator(
+        comments.select_related('author').order_by('created', 'id'),
+        settings.COMMENTS_PER_PAGE,
+        ordering=('created', 'id'),
+    )
+    return paginator.get_page(request.GET.get('after'))
 
 
-def paginate(request, posts):
-    paginator = Paginator(posts, settings.NUM_MSG)
+def paginate(request, posts, mode=None, scope=None):
+    if mode is None:
+        mode = get_pagination_mode(request)
+    if mode == CURSOR:
+        paginator = CursorPaginator(posts, settings.NUM_MSG)
+        return paginator.get_page(
+            request.GET.get('after'),
+            request.GET.get('before'),
+        )
+    if scope is None:
+        paginator = Paginator(posts, settings.NUM_MSG)
+    else:
+        paginator = CachedCountPaginator(posts, settings.NUM_MSG, scope)
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
@@ -1,23 +1,57 @@
+import hashlib
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
-from .models import Post, Group, User, Comment, Follow
+from django.urls import reverse
+from django.views.decorators.vary import vary_on_headers
+from .models import Post, Group, User, Comment, Follow, Tag
 from .forms import PostForm, CommentForm
-from .utils import paginate
+from .utils import CLASSIC, comment_page, count_scope, paginate
+from .search import SearchResults
+from .export import (
+    CONTENT_TYPES,
+    EXPORTS,
+    FORMATS,
+    ExportError,
+    export_lines,
+    export_queryset,
+)
+from .tags import tag_feed, tag_name
+from .feeds import HybridFeed, follow_feed
+from .follows import follow, unfollow
+from .thumbnails import schedule_thumbnails
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
 from django.conf import settings
+from django.db import transaction
+from core.ratelimit import ratelimit
+from .caching import (
+    cache_page_by_generation,
+    group_page_generations,
+    profile_page_generations,
+)
 
 
-@cache_page(settings.CACHE_TIME, key_prefix='index_page')
+@cache_page_by_generation(
+    settings.PAGE_CACHE_TIME,
+    key_prefix='index_page',
+    generations=('posts', 'groups', 'users'),
+)
 def index(request):
     template = 'posts/index.html'
     posts = Post.objects.select_related('author', 'group')
     context = {
         'posts': posts,
-        'page_obj': paginate(request, posts)
+        'page_obj': paginate(request, posts, scope=count_scope('global'))
     }
     return render(request, template, context)
 
 
+@cache_page_by_generation(
+    settings.PAGE_CACHE_TIME,
+    key_prefix='group_page',
+    generations=group_page_generations,
+)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     posts = group.posts.select_related('author')
@@ -25,13 +59,23 @@ def group_posts(request, slug):
     context = {
         'group': group,
         'posts': posts,
-        'page_obj': paginate(request, posts)
+        'page_obj': paginate(
+            request, posts, scope=count_scope('group', group.id)
+        )
     }
     return render(request, template, context)
 
 
+@cache_page_by_generation(
+    settings.PAGE_CACHE_TIME,
+    key_prefix='profile_page',
+    generations=profile_page_generations,
+)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('profile'),
+        username=username
+    )
     posts = author.posts.select_related('author')
     following = (
         request.user.is_authenticated
@@ -44,27 +88,106 @@ def profile(request, username):
     template = 'posts/profile.html'
     context = {
         'author': author,
-        'page_obj': paginate(request, posts),
+        'page_obj': paginate(
+            request, posts, scope=count_scope('author', author.id)
+        ),
         'posts': posts,
         'following': following,
     }
     return render(request, template, context)
 
 
+@cache_page_by_generation(
+    settings.PAGE_CACHE_TIME,
+    key_prefix='tag_page',
+    generations=('posts', 'groups', 'users'),
+)
+def tag_posts(request, name):
+    tag = get_object_or_404(Tag, name=tag_name(name))
+    context = {
+        'tag': tag,
+        'page_obj': paginate(
+            request, tag_feed(tag), scope=count_scope('tag', tag.id)
+        ),
+    }
+    return render(request, 'posts/tag_list.html', context)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    results = SearchResults(query)
+    scope = count_scope(
+        'search', hashlib.md5(results.match.encode()).hexdigest()
+    )
+    context = {
+        'query': query,
+        'page_obj': paginate(request, results, mode=CLASSIC, scope=scope),
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@staff_member_required
+def export(request, kind):
+    if kind not in EXPORTS:
+        raise Http404
+    export_format = request.GET.get('format', 'jsonl')
+    if export_format not in FORMATS:
+        return HttpResponseBadRequest('Формат: jsonl или csv.')
+    try:
+        queryset = export_queryset(
+            kind,
+            author=request.GET.get('author'),
+            group=request.GET.get('group'),
+            since=request.GET.get('since'),
+            until=request.GET.get('until'),
+        )
+    except ExportError as error:
+        return HttpResponseBadRequest(str(error))
+    response = StreamingHttpResponse(
+        export_lines(kind, queryset, export_format),
+        content_type=CONTENT_TYPES[export_format],
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{kind}.{export_format}"'
+    )
+    return response
+
+
 def post_detail(request, post_id):
-    posts = get_object_or_404(Post, id=post_id)
+    posts = get_object_or_404(
+        Post.objects.select_related('author__profile', 'group'),
+        id=post_id
+    )
     template = 'posts/post_detail.html'
     form = CommentForm()
-    comments = posts.comments.all()
     context = {
         'posts': posts,
-        'comments': comments,
+        'comments': comment_page(request, posts.comments.all()),
         'form': form,
     }
     return render(request, template, context)
 
 
+@vary_on_headers('X-Requested-With')
+def comment_list(request, post_id):
+    if not Post.objects.filter(id=post_id).exists():
+        raise Http404
+    if not request.is_ajax():
+        # Без скрипта ссылка «Показать ещё» открывает страницу поста
+        # со следующей порцией комментариев.
+        url = reverse('posts:post_detail', args=[post_id])
+        return redirect(f'{url}?{request.GET.urlencode()}')
+    context = {
+        'post_id': post_id,
+        'comments': comment_page(
+            request, Comment.objects.filter(post_id=post_id)
+        ),
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
 @login_required
+@ratelimit('post_create')
 def post_create(request):
     template = 'posts/create_post.html'
     form = PostForm()
@@ -80,7 +203,10 @@ def post_create(request):
         return render(request, template, context)
     post = form.save(commit=False)
     post.author = request.user
-    post.save()
+    # Пост и задачи его обработки фиксируются одним коммитом.
+    with transaction.atomic():
+        post.save()
+        schedule_thumbnails(post)
     return redirect('posts:profile', request.user.username)
 
 
@@ -96,7 +222,10 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid():
-        form.save()
+        with transaction.atomic():
+            form.save()
+            if 'image' in form.changed_data:
+                schedule_thumbnails(post)
         return redirect('posts:post_detail', post_id=post_id)
     context = {
 
@@ -107,6 +236,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@ratelimit('add_comment')
 def add_comment(request, post_id):
     form = CommentForm(request.POST or None)
     post = get_object_or_404(Post, id=post_id)
@@ -129,37 +259,28 @@ def delete_comment(request, comment_id):
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.select_related(
-        'author',
-        'group',
-    ).filter(author__following__user=request.user)
+    posts = follow_feed(request.user)
+    # HybridFeed сам кэширует число постов своей Timeline.
+    scope = None
+    if not isinstance(posts, HybridFeed):
+        scope = count_scope('follow', request.user.id)
     context = {
-        'page_obj': paginate(request, posts),
+        'page_obj': paginate(request, posts, scope=scope),
     }
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
 def profile_follow(request, username):
-    author = get_object_or_404(
-        User,
-        username=username
-    )
-    if (author.id != request.user.id):
-        Follow.objects.get_or_create(
-            user=request.user,
-            author=author,
-        )
+    author = get_object_or_404(User, username=username)
+    follow(request.user, author)
     return redirect('posts:profile', username=username)
 
 
 @login_required
 def profile_unfollow(request, username):
-    get_object_or_404(
-        Follow,
-        user=request.user,
-        author__username=username
-    ).delete()
+    author = get_object_or_404(User, username=username)
+    unfollow(request.user, author)
     return redirect('posts:profile', username=username)
 
 # Create your views here.
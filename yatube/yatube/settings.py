@@ -154,13 +154,95 @@ EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 
 NUM_MSG = 10
-CACHE_TIME = 20
+COMMENTS_PER_PAGE = 20
+# Число постов в ленте кэшируется; выше порога берётся оценка.
+PAGINATOR_COUNT_CACHE_TIME = 5 * 60
+PAGINATOR_ESTIMATE_THRESHOLD = 10000
+# Пагинация: 'classic' (номера страниц) или 'cursor' (?after=/?before=).
+PAGINATION_DEFAULT_MODE = 'classic'
+PAGINATION_MODES = {
+    'index': 'classic',
+    'group_list': 'classic',
+    'profile': 'classic',
+    'follow_index': 'classic',
+    'tag_posts': 'classic',
+}
+# Страницы кэшируются надолго: записи сдвигают поколения в ключах.
+PAGE_CACHE_TIME = 24 * 60 * 60
+# Отрендеренные карточки постов; ключ меняется с версией карточки.
+POST_CARD_CACHE_TIME = 24 * 60 * 60
+# Поиск ранжирует не больше SEARCH_CANDIDATES самых новых совпадений.
+SEARCH_CANDIDATES = 1000
+SEARCH_MAX_WORDS = 10
+# Хештеги: не больше TAG_MAX_PER_POST на пост; популярные теги
+# считаются за последние TAG_TRENDING_WINDOW секунд.
+TAG_MAX_PER_POST = 10
+TAG_TRENDING_WINDOW = 7 * 24 * 60 * 60
+TAG_TRENDING_LIMIT = 10
+TAG_TRENDING_CACHE_TIME = 10 * 60
+# Размер пачки при записи в материализованные ленты подписок.
+TIMELINE_BATCH_SIZE = 1000
+# Посты авторов с числом подписчиков выше порога не раскладываются
+# по лентам, а подмешиваются при чтении из кэша свежих постов.
+FEED_PULL_THRESHOLD = 10000
+FEED_PULL_LIMIT = 200
+FEED_PULL_CACHE_TIME = 60 * 60
+FEED_PULL_AUTHORS_CACHE_TIME = 5 * 60
+# Миниатюры создаются в фоне после загрузки картинки; геометрии
+# должны совпадать с тегами {% thumbnail %} в шаблонах постов.
+POST_THUMBNAIL_GEOMETRIES = (
+    ('960x339', {'crop': 'center', 'upscale': True}),
+)
+# Варианты картинки для srcset: ширины, форматы (последний - запасной
+# для <img>) и пропорции кадра как у миниатюры 960x339.
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+POST_IMAGE_FORMATS = ('webp', 'jpeg')
+POST_IMAGE_RATIO = (960, 339)
+POST_IMAGE_QUALITY = 80
+POST_IMAGE_SIZES = '(max-width: 960px) 100vw, 960px'
+# Ширина размытой заглушки, которая хранится в посте как data URI.
+POST_IMAGE_PLACEHOLDER_WIDTH = 16
+
+# Ограничение частоты записей: (burst, period) - не больше burst запросов
+# подряд, ведро токенов наполняется целиком за period секунд. Ключи
+# ведра живут RATELIMIT_KEY_PERIODS периодов, потом ведро снова полное.
+RATELIMITS = {
+    'post_create': (10, 10 * 60),
+    'add_comment': (20, 10 * 60),
+}
+RATELIMIT_KEY_PERIODS = 24
+# Очередь фоновых задач в таблице core_task; задачи выполняет
+# manage.py run_workers. С TASKS_EAGER задачи выполняются сразу при
+# постановке, без обработчика; включать его стоит только в тестах
+# (override_settings), иначе запросы ждут ленты и картинки сами,
+# а очередь стоит без дела. Упавшая задача повторяется
+# через TASKS_RETRY_DELAY секунд, с каждой попыткой вдвое дольше,
+# а задача обработчика, пропавшего дольше TASKS_LOCK_TIMEOUT секунд,
+# снова ставится в очередь.
+TASKS_EAGER = False
+TASKS_MAX_ATTEMPTS = 3
+TASKS_RETRY_DELAY = 60
+TASKS_LOCK_TIMEOUT = 10 * 60
+TASKS_WORKERS = 2
+TASKS_POLL_INTERVAL = 1
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
-
+# Раздача медиа без DEBUG: 'python' - сам Django с поддержкой Range;
+# 'x-accel' (nginx) и 'x-sendfile' (Apache, lighttpd) - только заголовок,
+# файл отдаёт веб-сервер. Для nginx нужен internal location с префиксом
+# MEDIA_ACCEL_REDIRECT_PREFIX, указывающий на MEDIA_ROOT.
+MEDIA_SERVE_MODE = 'python'
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+MEDIA_CACHE_MAX_AGE = 7 * 24 * 60 * 60
+
+# Кэш общий для всех процессов сайта и обработчиков run_workers:
+# задачи очереди сбрасывают счётчики лент и сдвигают поколения
+# страниц, и это должны видеть веб-процессы. Таблицу создаёт миграция
+# core; в продакшене лучше memcached или Redis.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'core_cache',
     }
 }
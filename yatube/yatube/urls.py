@@ -13,11 +13,15 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.views import serve_media
+
 urlpatterns = [
     path('', include('posts.urls', namespace='posts')),
     path('admin/', admin.site.urls),
@@ -36,3 +40,11 @@ if settings.DEBUG:
     )
     import debug_toolbar
     urlpatterns += (path('__debug__/', include(debug_toolbar.urls)),)
+elif settings.MEDIA_URL.startswith('/'):
+    urlpatterns += [
+        re_path(
+            r'^%s(?P<path>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')),
+            serve_media,
+            name='media',
+        ),
+    ]